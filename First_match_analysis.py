@@ -6,6 +6,7 @@ from collections import defaultdict
 from scipy import stats
 from data_reader import *
 from information_calculations import *
+from corpus import Corpus
 
 """
 This script calculates the experiment wide averages (for both games where a convention emerged and games where they didn't) for the fraction of particpant matches where the name that was ultimately match on was first seen via the unstructured source and then only seen via the unstructured source. There are many of path ways through which the participant could be influenced by the exposure to the unstructured source, but unpacking those woul be quite hard.  For example, the participant might first see the name via the structured source, but then later twice via the unstructured source and then play it. The variants are numerous and finding the true regularities wouldn't necessarily enrich our knowledge, so I instead focus on the coarser counts above.
@@ -91,14 +92,9 @@ def match_prior_exposures(participant_data, file_name):
     return (game_fraction_unstructured_before_structured/cnt, game_fraction_only_unstructured/cnt)
 
 
-def analyze_game(file_name, memory_length, divergence_type="JS"):
-    # extracting the right data from the Otree CSV
-    game_data = import_file(file_name)
-
-    # packing the game data in useful ways
-    participant_data, group_round_names = preanalysis_packing(game_data)
-
-    return match_prior_exposures(participant_data, file_name)
+def analyze_game(session, memory_length, divergence_type="JS"):
+    # the corpus has already extracted and packed the game data
+    return match_prior_exposures(session.participant_data, session.file_name)
 
 
 
@@ -106,68 +102,64 @@ def analyze_game(file_name, memory_length, divergence_type="JS"):
 We now initialize some parameters and counters and then loop over all the games while recording the results.
 """
 
-memory_length = 8
-div_type = "KL" #JS or KL
+if __name__ == "__main__":
+    memory_length = 8
+    div_type = "KL" #JS or KL
 
-convention_names = ["2addtl-RANDOMA","2addtl-RANDOMB","2addtl-RANDOMC",
-                    "2addtl-RANDOMD","2addtl-SMALLA","2addtl-SMALLB",
-                    "2addtl-SMALLC","2addtl-SMALLD","2addtl-LATTICED",
-                    "1addtl-RANDOMB","1addtl-RANDOMD","1addtl-SMALLC"]
+    convention_names = ["2addtl-RANDOMA","2addtl-RANDOMB","2addtl-RANDOMC",
+                        "2addtl-RANDOMD","2addtl-SMALLA","2addtl-SMALLB",
+                        "2addtl-SMALLC","2addtl-SMALLD","2addtl-LATTICED",
+                        "1addtl-RANDOMB","1addtl-RANDOMD","1addtl-SMALLC"]
 
-successful_unstructured_before_structured_1 = 0
-successful_only_unstructured_1 = 0
-unsuccessful_unstructured_before_structured_1 = 0
-unsuccessful_only_unstructured_1 = 0
+    successful_unstructured_before_structured_1 = 0
+    successful_only_unstructured_1 = 0
+    unsuccessful_unstructured_before_structured_1 = 0
+    unsuccessful_only_unstructured_1 = 0
 
-successful_unstructured_before_structured_2 = 0
-successful_only_unstructured_2 = 0
-unsuccessful_unstructured_before_structured_2 = 0
-unsuccessful_only_unstructured_2 = 0
+    successful_unstructured_before_structured_2 = 0
+    successful_only_unstructured_2 = 0
+    unsuccessful_unstructured_before_structured_2 = 0
+    unsuccessful_only_unstructured_2 = 0
 
-successful_count_1 = 0
-unsuccessful_count_1 = 0
-successful_count_2 = 0
-unsuccessful_count_2 = 0
+    successful_count_1 = 0
+    unsuccessful_count_1 = 0
+    successful_count_2 = 0
+    unsuccessful_count_2 = 0
 
-for directory, sub, files in os.walk("../experiment_data"):
-    for current_file_name in files:
-        if "Data" in current_file_name and not "ignore" in current_file_name and not "0addtl" in current_file_name and not "MLM" in current_file_name:
+    corpus = Corpus(convention_runs=convention_names)
 
-            file_name = "/".join([directory,current_file_name])
+    for session in corpus.select(additional_names_count=(1,2,3)):
 
-            results = analyze_game(file_name, memory_length,divergence_type=div_type)
-            print("Fraction unstructured b4 structured: {} \n Fraction only unstructured: {}".format(*results))
+        results = analyze_game(session, memory_length,divergence_type=div_type)
+        print("Fraction unstructured b4 structured: {} \n Fraction only unstructured: {}".format(*results))
 
 
-            run_name = current_file_name.replace("Data-","").replace(".csv","")
-            if run_name in convention_names:
-                if "1addtl" in run_name:
-                        successful_unstructured_before_structured_1 += results[0]
-                        successful_only_unstructured_1 += results[1]
-                        successful_count_1 += 1
-                else:
-                        successful_unstructured_before_structured_2 += results[0]
-                        successful_only_unstructured_2 += results[1]
-                        successful_count_2 += 1
-
+        if session.convention_emerged:
+            if session.additional_names_count == 1:
+                successful_unstructured_before_structured_1 += results[0]
+                successful_only_unstructured_1 += results[1]
+                successful_count_1 += 1
             else:
-                if "1addtl" in run_name:
-                    unsuccessful_unstructured_before_structured_1 += results[0]
-                    unsuccessful_only_unstructured_1 += results[1]
-                    unsuccessful_count_1+= 1
-                elif "2addtl":
-                    unsuccessful_unstructured_before_structured_2 += results[0]
-                    unsuccessful_only_unstructured_2 += results[1]
-                    unsuccessful_count_2+= 1
-                else:
-                    pass
-
-print("Successful UBS1:", round(successful_unstructured_before_structured_1/successful_count_1,2))
-print("Sucessful OU1:", round(successful_only_unstructured_1/successful_count_1,2))
-print("Successful UBS2:", round(successful_unstructured_before_structured_2/successful_count_2, 2))
-print("Sucessful OU2:", round(successful_only_unstructured_2/successful_count_2, 2))
-
-print("Unsuccessful UBS:", round(unsuccessful_unstructured_before_structured_1/unsuccessful_count_1, 2))
-print("Unsuccessful OU:",round(unsuccessful_only_unstructured_1/unsuccessful_count_1, 2))
-print("Unsuccessful UBS:", round(unsuccessful_unstructured_before_structured_2/unsuccessful_count_2, 2))
-print("Unsuccessful OU:", round(unsuccessful_only_unstructured_2/unsuccessful_count_2, 2))
+                successful_unstructured_before_structured_2 += results[0]
+                successful_only_unstructured_2 += results[1]
+                successful_count_2 += 1
+
+        else:
+            if session.additional_names_count == 1:
+                unsuccessful_unstructured_before_structured_1 += results[0]
+                unsuccessful_only_unstructured_1 += results[1]
+                unsuccessful_count_1+= 1
+            else:
+                unsuccessful_unstructured_before_structured_2 += results[0]
+                unsuccessful_only_unstructured_2 += results[1]
+                unsuccessful_count_2+= 1
+
+    print("Successful UBS1:", round(successful_unstructured_before_structured_1/successful_count_1,2))
+    print("Sucessful OU1:", round(successful_only_unstructured_1/successful_count_1,2))
+    print("Successful UBS2:", round(successful_unstructured_before_structured_2/successful_count_2, 2))
+    print("Sucessful OU2:", round(successful_only_unstructured_2/successful_count_2, 2))
+
+    print("Unsuccessful UBS:", round(unsuccessful_unstructured_before_structured_1/unsuccessful_count_1, 2))
+    print("Unsuccessful OU:",round(unsuccessful_only_unstructured_1/unsuccessful_count_1, 2))
+    print("Unsuccessful UBS:", round(unsuccessful_unstructured_before_structured_2/unsuccessful_count_2, 2))
+    print("Unsuccessful OU:", round(unsuccessful_only_unstructured_2/unsuccessful_count_2, 2))
@@ -4,50 +4,29 @@ from collections import defaultdict
 from scipy import stats
 from data_reader import *
 from information_calculations import *
+from corpus import Corpus
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d.axes3d import Axes3D
 from matplotlib import cm
 
 """
-This script creates the panel of 3d plots showing information gain as a function of the round and the number of additional names the player sees. For each participant and each round, the gain is simulated by sampling the current number of names 200 times.
+This script creates the panel of 3d plots showing information gain as a function of the round and the number of additional names the player sees. For each participant and each round, the gain is simulated by sampling the current number of names 200 times. Setting target_sem samples each one until its average settles instead, and setting exact computes it exactly wherever the names can only come out a few ways, both of which are slower.
 """
 
 
 
-def analyze_game(file_name, memory_length, divergence_type="JS"):
+def analyze_game(surface):
     """
-    The primary method of the plotting. It calls the "simulate_information_gains" function in the
-    the "information_calculations" module.  That function returns a list of divergences, one for each round. The value is the average of 200 divergence differences based on synthetic distributions of names.
+    The surfaces come from the "gain_surfaces" function in the "information_calculations"
+    module, which runs "simulate_gain_surface" (the session wide version of
+    "simulate_information_gains") for every session in a pool of processes and keeps the
+    results in its cache, so re-plotting doesn't simulate again. For each round and number
+    of additional names, the value is the average of the divergences based on synthetic
+    distributions of names; the surface is round x number of additional names x participant.
     """
 
-    # extracting the right data from the Otree CSV
-    game_data = import_file(file_name)
-
-    # packing the game data in useful ways
-    participant_data, group_round_names = preanalysis_packing(game_data)
-
-    # Applying "limited memory" to the whole system to discount names no longer in circulation
-    true_distro_by_round = impose_limited_memory(group_round_names, memory_length)
-
-    file_stem = current_file_name.split("-")
-
-
-    # We store all the participants divergence averages here.
-    three_d = [[[] for i in range(23)] for j in range(25)]
-
-    for participant, data in participant_data.items():
-        # getting the no-unstructured info distribution, the baseline for comparison.
-        distro_by_round_no_unstructured = impose_limited_memory(data["distro_by_round_no_unstructured"],
-                                                    memory_length=memory_length)
-
-        for rnd in range(0,25):
-            # sending the baseline off for simulated gains.
-            divergence_avgs = simulate_information_gains(distro_by_round_no_unstructured[rnd+1],
-                                                         true_distro_by_round[rnd+1],
-                                                         divergence_type=divergence_type)
-            # for each round, we record the participant's average for each number of names.
-            for indx, divergence in enumerate(divergence_avgs):
-                    three_d[rnd][indx].append(divergence)
+    # for each round, we record the participants' averages for each number of names.
+    three_d = [[surface[rnd, indx].tolist() for indx in range(23)] for rnd in range(25)]
 
     return three_d
 
@@ -90,163 +69,167 @@ def merge_3d_lists(group, new):
 
 
 
-memory_length = 8
-div_type = "KL" #JS or KL
+if __name__ == "__main__":
+    memory_length = 8
+    div_type = "KL" #JS or KL
+    master_seed = 20170601 # every session and round draws from its own stream of this seed (None for unseeded)
+    exact = False # exact averages where there are few enough ways to draw the names
+    target_sem = None # sample each cell until the standard error of its average is below this, e.g. .01 (None for 200 draws)
+    processes = None # worker processes for the sessions not in the cache yet (None for one per core)
 
-# We combine all the individual run data into a lists for each of the six subplots.
-random_success = [[[] for i in range(23)] for j in range(25)]
-random_failure = [[[] for i in range(23)] for j in range(25)]
-sw_success = [[[] for i in range(23)] for j in range(25)]
-sw_failure = [[[] for i in range(23)] for j in range(25)]
-lattice_success = [[[] for i in range(23)] for j in range(25)]
-lattice_failure = [[[] for i in range(23)] for j in range(25)]
-random_zero = [[[] for i in range(23)] for j in range(25)]
-sw_zero = [[[] for i in range(23)] for j in range(25)]
-lattice_zero = [[[] for i in range(23)] for j in range(25)]
+    # We combine all the individual run data into a lists for each of the six subplots.
+    random_success = [[[] for i in range(23)] for j in range(25)]
+    random_failure = [[[] for i in range(23)] for j in range(25)]
+    sw_success = [[[] for i in range(23)] for j in range(25)]
+    sw_failure = [[[] for i in range(23)] for j in range(25)]
+    lattice_success = [[[] for i in range(23)] for j in range(25)]
+    lattice_failure = [[[] for i in range(23)] for j in range(25)]
+    random_zero = [[[] for i in range(23)] for j in range(25)]
+    sw_zero = [[[] for i in range(23)] for j in range(25)]
+    lattice_zero = [[[] for i in range(23)] for j in range(25)]
 
 
-for directory, sub, files in os.walk("../experiment_data"):
-    for current_file_name in files:
-        # We don't look at the files with no
-        if "Data" in current_file_name and not "ignore" in current_file_name and not "MLM" in current_file_name:
+    # These runs resulted in a convention. The list is used to sort the data into successful and failed runs.
+    convention_names = ["2addtl-RANDOMA","2addtl-RANDOMB","2addtl-RANDOMC",
+                            "2addtl-RANDOMD","2addtl-SMALLA","2addtl-SMALLB",
+                            "2addtl-SMALLC","2addtl-SMALLD","2addtl-LATTICED",
+                           "1addtl-RANDOMB","1addtl-RANDOMD","1addtl-SMALLC"]
 
-            file_name = "/".join([directory,current_file_name])
+    corpus = Corpus(convention_runs=convention_names)
 
-            results = analyze_game(file_name, memory_length,divergence_type=div_type)
+    sessions = corpus.select()
+    surfaces = gain_surfaces(sessions, memory_length=memory_length, divergence_type=div_type,
+                             exact=exact, target_sem=target_sem, seed=master_seed, processes=processes)
 
-            # These runs resulted in a convention. The list is used to sort the data into successful and failed runs.
-            convention_names = ["2addtl-RANDOMA","2addtl-RANDOMB","2addtl-RANDOMC",
-                                    "2addtl-RANDOMD","2addtl-SMALLA","2addtl-SMALLB",
-                                    "2addtl-SMALLC","2addtl-SMALLD","2addtl-LATTICED",
-                                   "1addtl-RANDOMB","1addtl-RANDOMD","1addtl-SMALLC"]
+    for session in sessions:
 
+        results = analyze_game(surfaces[session.run_key])
 
-            # creating the master  array of round by names values,
-            run_name = current_file_name.replace("Data-","").replace(".csv","")
-            if run_name in convention_names:
-                if "RANDOM" in run_name:
-                    merge_3d_lists(random_success,results)
-                elif "LATTICE" in run_name:
-                    merge_3d_lists(lattice_success,results)
+        # creating the master  array of round by names values,
+        if session.convention_emerged:
+            if session.topology == "RANDOM":
+                merge_3d_lists(random_success,results)
+            elif session.topology == "LATTICE":
+                merge_3d_lists(lattice_success,results)
+            else:
+                merge_3d_lists(sw_success,results)
+        else:
+            if session.topology == "RANDOM":
+                if session.additional_names_count == 0:
+                    merge_3d_lists(random_zero,results)
+                else:
+                    merge_3d_lists(random_failure,results)
+            elif session.topology == "LATTICE":
+                if session.additional_names_count == 0:
+                    merge_3d_lists(lattice_zero,results)
                 else:
-                    merge_3d_lists(sw_success,results)
+                    merge_3d_lists(lattice_failure,results)
             else:
-                if "RANDOM" in run_name:
-                    if "0addtl-" in run_name:
-                        merge_3d_lists(random_zero,results)
-                    else:
-                        merge_3d_lists(random_failure,results)
-                elif "LATTICE" in run_name:
-                    if "0addtl-" in run_name:
-                        merge_3d_lists(lattice_zero,results)
-                    else:
-                        merge_3d_lists(lattice_failure,results)
+                if session.additional_names_count == 0:
+                    merge_3d_lists(sw_zero,results)
                 else:
-                    if "0addtl-" in run_name:
-                        merge_3d_lists(sw_zero,results)
-                    else:
-                        merge_3d_lists(sw_failure,results)
-
-# creating the figure
-fig = plt.figure(figsize=(10,16))
-
-# random networks, successful runs, (upper left)
-ax = fig.add_subplot(331, projection='3d')
-ax.set_title("A: Random, successful")
-ax.set_xlabel("Round No.")
-ax.set_ylabel("Add'l Names")
-ax.set_zlim(0,3)
-ax.view_init(22, 35)
-x,y,z = flatten_matrix(average_vals(random_success))
-ax.plot_trisurf(x, y, z, cmap=plt.cm.viridis, linewidth=0.2)
-
-#Random networks, failed runs (upper middle)
-ax = fig.add_subplot(332, projection='3d')
-ax.set_title("D: Random, failure")
-ax.set_xlabel("Round No.")
-ax.set_ylabel("Add'l Names")
-ax.set_zlabel("Divergence Diff.")
-ax.set_zlim(0,3)
-ax.view_init(22, 35)
-x,y,z = flatten_matrix(average_vals(random_failure))
-ax.plot_trisurf(x, y, z, cmap=plt.cm.viridis, linewidth=0.2)
-
-#Random networks, failed runs (upper right)
-ax = fig.add_subplot(333, projection='3d')
-ax.set_title("G: Random, no add'l names")
-ax.set_xlabel("Round No.")
-ax.set_ylabel("Add'l Names")
-ax.set_zlabel("Divergence Diff.")
-ax.set_zlim(0,3)
-ax.view_init(22, 35)
-x,y,z = flatten_matrix(average_vals(random_zero))
-ax.plot_trisurf(x, y, z, cmap=plt.cm.viridis, linewidth=0.2)
-
-# Small World, successful runs (middle left)
-ax = fig.add_subplot(334, projection='3d')
-ax.set_title("B: Small World, successful")
-ax.set_xlabel("Round No.")
-ax.set_ylabel("Add'l Names")
-ax.set_zlim(0,3)
-ax.view_init(22, 35)
-x,y,z =flatten_matrix(average_vals(sw_success))
-ax.plot_trisurf(x, y, z, cmap=plt.cm.viridis, linewidth=0.2)
-
-# Small Wordl, failed runs (middle middle)
-ax = fig.add_subplot(335, projection='3d')
-ax.set_title("E: Small World, failure")
-ax.set_zlabel("Divergence Diff.")
-ax.set_xlabel("Round No.")
-ax.set_ylabel("Add'l Names")
-ax.set_zlim(0,3)
-ax.view_init(22, 35)
-x,y,z = flatten_matrix(average_vals(sw_failure))
-ax.plot_trisurf(x, y, z, cmap=plt.cm.viridis, linewidth=0.2)
-
-# Small Wordl, failed runs (middle right)
-ax = fig.add_subplot(336, projection='3d')
-ax.set_title("H: Small World, no add'l names")
-ax.set_zlabel("Divergence Diff.")
-ax.set_xlabel("Round No.")
-ax.set_ylabel("Add'l Names")
-ax.set_zlim(0,3)
-ax.view_init(22, 35)
-x,y,z = flatten_matrix(average_vals(sw_zero))
-ax.plot_trisurf(x, y, z, cmap=plt.cm.viridis, linewidth=0.2)
-
-# lattice networks, successful runs (bottom left)
-ax = fig.add_subplot(337, projection='3d')
-ax.set_title("C: Lattice, successful")
-ax.set_xlabel("Round No.")
-ax.set_ylabel("Add'l Names")
-ax.set_zlim(0,3)
-ax.view_init(22, 35)
-x,y,z = flatten_matrix(average_vals(lattice_success))
-ax.plot_trisurf(x, y, z, cmap=plt.cm.viridis, linewidth=0.2)
-
-# lattice networks, failed runs (bottom middle)
-ax = fig.add_subplot(338, projection='3d')
-ax.set_title("F: Lattice, failure")
-ax.set_zlabel("Divergence Diff.")
-ax.set_xlabel("Round No.")
-ax.set_ylabel("Add'l Names")
-ax.set_zlim(0,3)
-ax.view_init(22, 35)
-x,y,z = flatten_matrix(average_vals(lattice_failure))
-ax.plot_trisurf(x, y, z, cmap=plt.cm.viridis, linewidth=0.2)
-
-# lattice networks, failed runs (bottom right)
-ax = fig.add_subplot(339, projection='3d')
-ax.set_title("I: Lattice, no add'l names")
-ax.set_zlabel("Divergence Diff.")
-ax.set_xlabel("Round No.")
-ax.set_ylabel("Add'l Names")
-ax.set_zlim(0,3)
-ax.view_init(22, 35)
-x,y,z = flatten_matrix(average_vals(lattice_zero))
-ax.plot_trisurf(x, y, z, cmap=plt.cm.viridis, linewidth=0.2)
-
-# Just tightening the layout up a bit
-plt.subplots_adjust(left=.125, bottom=0.15, right=.9, top=0.7, wspace=.1, hspace=.2)
-
-plt.savefig("../analysis/Gain_by_names_{}_mem_{}_zeros.png".format(div_type,memory_length),dpi=300)
+                    merge_3d_lists(sw_failure,results)
+
+    # creating the figure
+    fig = plt.figure(figsize=(10,16))
+
+    # random networks, successful runs, (upper left)
+    ax = fig.add_subplot(331, projection='3d')
+    ax.set_title("A: Random, successful")
+    ax.set_xlabel("Round No.")
+    ax.set_ylabel("Add'l Names")
+    ax.set_zlim(0,3)
+    ax.view_init(22, 35)
+    x,y,z = flatten_matrix(average_vals(random_success))
+    ax.plot_trisurf(x, y, z, cmap=plt.cm.viridis, linewidth=0.2)
+
+    #Random networks, failed runs (upper middle)
+    ax = fig.add_subplot(332, projection='3d')
+    ax.set_title("D: Random, failure")
+    ax.set_xlabel("Round No.")
+    ax.set_ylabel("Add'l Names")
+    ax.set_zlabel("Divergence Diff.")
+    ax.set_zlim(0,3)
+    ax.view_init(22, 35)
+    x,y,z = flatten_matrix(average_vals(random_failure))
+    ax.plot_trisurf(x, y, z, cmap=plt.cm.viridis, linewidth=0.2)
+
+    #Random networks, failed runs (upper right)
+    ax = fig.add_subplot(333, projection='3d')
+    ax.set_title("G: Random, no add'l names")
+    ax.set_xlabel("Round No.")
+    ax.set_ylabel("Add'l Names")
+    ax.set_zlabel("Divergence Diff.")
+    ax.set_zlim(0,3)
+    ax.view_init(22, 35)
+    x,y,z = flatten_matrix(average_vals(random_zero))
+    ax.plot_trisurf(x, y, z, cmap=plt.cm.viridis, linewidth=0.2)
+
+    # Small World, successful runs (middle left)
+    ax = fig.add_subplot(334, projection='3d')
+    ax.set_title("B: Small World, successful")
+    ax.set_xlabel("Round No.")
+    ax.set_ylabel("Add'l Names")
+    ax.set_zlim(0,3)
+    ax.view_init(22, 35)
+    x,y,z =flatten_matrix(average_vals(sw_success))
+    ax.plot_trisurf(x, y, z, cmap=plt.cm.viridis, linewidth=0.2)
+
+    # Small Wordl, failed runs (middle middle)
+    ax = fig.add_subplot(335, projection='3d')
+    ax.set_title("E: Small World, failure")
+    ax.set_zlabel("Divergence Diff.")
+    ax.set_xlabel("Round No.")
+    ax.set_ylabel("Add'l Names")
+    ax.set_zlim(0,3)
+    ax.view_init(22, 35)
+    x,y,z = flatten_matrix(average_vals(sw_failure))
+    ax.plot_trisurf(x, y, z, cmap=plt.cm.viridis, linewidth=0.2)
+
+    # Small Wordl, failed runs (middle right)
+    ax = fig.add_subplot(336, projection='3d')
+    ax.set_title("H: Small World, no add'l names")
+    ax.set_zlabel("Divergence Diff.")
+    ax.set_xlabel("Round No.")
+    ax.set_ylabel("Add'l Names")
+    ax.set_zlim(0,3)
+    ax.view_init(22, 35)
+    x,y,z = flatten_matrix(average_vals(sw_zero))
+    ax.plot_trisurf(x, y, z, cmap=plt.cm.viridis, linewidth=0.2)
+
+    # lattice networks, successful runs (bottom left)
+    ax = fig.add_subplot(337, projection='3d')
+    ax.set_title("C: Lattice, successful")
+    ax.set_xlabel("Round No.")
+    ax.set_ylabel("Add'l Names")
+    ax.set_zlim(0,3)
+    ax.view_init(22, 35)
+    x,y,z = flatten_matrix(average_vals(lattice_success))
+    ax.plot_trisurf(x, y, z, cmap=plt.cm.viridis, linewidth=0.2)
+
+    # lattice networks, failed runs (bottom middle)
+    ax = fig.add_subplot(338, projection='3d')
+    ax.set_title("F: Lattice, failure")
+    ax.set_zlabel("Divergence Diff.")
+    ax.set_xlabel("Round No.")
+    ax.set_ylabel("Add'l Names")
+    ax.set_zlim(0,3)
+    ax.view_init(22, 35)
+    x,y,z = flatten_matrix(average_vals(lattice_failure))
+    ax.plot_trisurf(x, y, z, cmap=plt.cm.viridis, linewidth=0.2)
+
+    # lattice networks, failed runs (bottom right)
+    ax = fig.add_subplot(339, projection='3d')
+    ax.set_title("I: Lattice, no add'l names")
+    ax.set_zlabel("Divergence Diff.")
+    ax.set_xlabel("Round No.")
+    ax.set_ylabel("Add'l Names")
+    ax.set_zlim(0,3)
+    ax.view_init(22, 35)
+    x,y,z = flatten_matrix(average_vals(lattice_zero))
+    ax.plot_trisurf(x, y, z, cmap=plt.cm.viridis, linewidth=0.2)
+
+    # Just tightening the layout up a bit
+    plt.subplots_adjust(left=.125, bottom=0.15, right=.9, top=0.7, wspace=.1, hspace=.2)
+
+    plt.savefig("../analysis/Gain_by_names_{}_mem_{}_zeros.png".format(div_type,memory_length),dpi=300)
@@ -148,80 +148,80 @@ def compile_data(game_data):
 
 # ZERO names Full
 
-game_data = import_file("../experiment_data/Data-0addtl-FULLB.csv") # import_data is from the data_reader module
+game_data = import_file("../experiment_data/Data-0addtl-FULLB.csv", schema="dynamics") # import_data is from the data_reader module
 fullA_counts, fullA_success, fullA_entropy, fullA_HHI = compile_data(game_data)
 
-game_data = import_file("../experiment_data/Data-0addtl-FULLC.csv")
+game_data = import_file("../experiment_data/Data-0addtl-FULLC.csv", schema="dynamics")
 fullB_counts, fullB_success, fullB_entropy, fullB_HHI = compile_data(game_data)
 
 
 #ZERO names Random
 
-game_data = import_file("../experiment_data/Data-0addtl-RANDOMC.csv")
+game_data = import_file("../experiment_data/Data-0addtl-RANDOMC.csv", schema="dynamics")
 random0A_counts, random0A_success, random0A_entropy, random0A_HHI = compile_data(game_data)
 
-game_data = import_file("../experiment_data/Data-0addtl-RANDOMB.csv")
+game_data = import_file("../experiment_data/Data-0addtl-RANDOMB.csv", schema="dynamics")
 random0B_counts, random0B_success, random0B_entropy, random0B_HHI = compile_data(game_data)
 
 #ZERO names Small World
 
-game_data = import_file("../experiment_data/Data-0addtl-SMALLC.csv")
+game_data = import_file("../experiment_data/Data-0addtl-SMALLC.csv", schema="dynamics")
 sw0A_counts, sw0A_success, sw0A_entropy, sw0A_HHI = compile_data(game_data)
 
-game_data = import_file("../experiment_data/Data-0addtl-SMALLA.csv")
+game_data = import_file("../experiment_data/Data-0addtl-SMALLA.csv", schema="dynamics")
 sw0B_counts, sw0B_success, sw0B_entropy, sw0B_HHI = compile_data(game_data)
 
 #ZERO names Lattice
 
-game_data = import_file("../experiment_data/Data-0addtl-LATTICEC.csv")
+game_data = import_file("../experiment_data/Data-0addtl-LATTICEC.csv", schema="dynamics")
 lattice0A_counts, lattice0A_success, lattice0A_entropy, lattice0A_HHI = compile_data(game_data)
 
-game_data = import_file("../experiment_data/Data-0addtl-LATTICED.csv")
+game_data = import_file("../experiment_data/Data-0addtl-LATTICED.csv", schema="dynamics")
 lattice0B_counts, lattice0B_success, lattice0B_entropy, lattice0B_HHI = compile_data(game_data)
 
 # ONE name Random
-game_data = import_file("../experiment_data/Data-1addtl-RANDOMA.csv")
+game_data = import_file("../experiment_data/Data-1addtl-RANDOMA.csv", schema="dynamics")
 random1F_counts, random1F_success, random1F_entropy, random1F_HHI = compile_data(game_data)
 
-game_data = import_file("../experiment_data/Data-1addtl-RANDOMD.csv")
+game_data = import_file("../experiment_data/Data-1addtl-RANDOMD.csv", schema="dynamics")
 random1S_counts, random1S_success, random1S_entropy, random1S_HHI = compile_data(game_data)
 
 # ONE name Small World
 
-game_data = import_file("../experiment_data/Data-1addtl-SMALLA.csv")
+game_data = import_file("../experiment_data/Data-1addtl-SMALLA.csv", schema="dynamics")
 sw1F_counts, sw1F_success, sw1F_entropy, sw1F_HHI = compile_data(game_data)
 
-game_data = import_file("../experiment_data/Data-1addtl-SMALLC.csv")
+game_data = import_file("../experiment_data/Data-1addtl-SMALLC.csv", schema="dynamics")
 sw1S_counts, sw1S_success, sw1S_entropy, sw1S_HHI = compile_data(game_data)
 
 
 # ONE name Lattice
-game_data = import_file("../experiment_data/Data-1addtl-LATTICEA.csv")
+game_data = import_file("../experiment_data/Data-1addtl-LATTICEA.csv", schema="dynamics")
 lattice1_counts, lattice1_success, lattice1_entropy, lattice1_HHI = compile_data(game_data)
 
 # TWO name Random
 
-game_data = import_file("../experiment_data/Data-2addtl-RANDOMA.csv")
+game_data = import_file("../experiment_data/Data-2addtl-RANDOMA.csv", schema="dynamics")
 random2A_counts, random2A_success, random2A_entropy, random2A_HHI = compile_data(game_data)
 
-game_data = import_file("../experiment_data/Data-2addtl-RANDOMB.csv")
+game_data = import_file("../experiment_data/Data-2addtl-RANDOMB.csv", schema="dynamics")
 random2B_counts, random2B_success, random2B_entropy, random2B_HHI = compile_data(game_data)
 
 
 # TWO name Small World
 
-game_data = import_file("../experiment_data/Data-2addtl-SMALLA.csv")
+game_data = import_file("../experiment_data/Data-2addtl-SMALLA.csv", schema="dynamics")
 sw2A_counts, sw2A_success, sw2A_entropy, sw2A_HHI = compile_data(game_data)
 
-game_data = import_file("../experiment_data/Data-2addtl-SMALLD.csv")
+game_data = import_file("../experiment_data/Data-2addtl-SMALLD.csv", schema="dynamics")
 sw2B_counts, sw2B_success, sw2B_entropy, sw2B_HHI = compile_data(game_data)
 
 # TWO name Lattice
 
-game_data = import_file("../experiment_data/Data-2addtl-LATTICEB.csv")
+game_data = import_file("../experiment_data/Data-2addtl-LATTICEB.csv", schema="dynamics")
 lattice2F_counts, lattice2F_success, lattice2F_entropy, lattice2F_HHI = compile_data(game_data)
 
-game_data = import_file("../experiment_data/Data-2addtl-LATTICED.csv")
+game_data = import_file("../experiment_data/Data-2addtl-LATTICED.csv", schema="dynamics")
 lattice2S_counts, lattice2S_success, lattice2S_entropy, lattice2S_HHI = compile_data(game_data)
 
 
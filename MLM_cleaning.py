@@ -1,5 +1,8 @@
-import data_reader
+from corpus import Corpus, export_MLM
 
-file = "../experiment_data/Data-1addtl-RANDOMA.csv"
+if __name__ == "__main__":
+    # All the runs with additional names go into one long format file.
+    corpus = Corpus()
+    sessions = corpus.select(additional_names_count=(1,2,3), load=False)
 
-data_reader.import_file_for_MLM(file)
+    export_MLM("../experiment_data/MLM_all_sessions.csv", sessions)
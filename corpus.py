@@ -0,0 +1,603 @@
+"""
+This module loads the whole set of experiment runs at once. Every analysis
+script used to walk the data directory, load each run one after the other and
+recover the topology and treatment by splitting the file name. A Corpus does
+that once: it finds the data files, cross references them with the run
+catalog (Basic_run_data.json) and loads the runs in parallel worker processes.
+The runs are then indexed by (additional names count, topology, version,
+convention emerged) so a script can ask for just the subset it needs without
+re-reading any files.
+"""
+
+import os, re, csv, json, mmap, shutil, struct
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from data_reader import import_participants, preanalysis_packing, schema_fields, MLM_column_names, MLM_rows
+from data_reader import MLM_names_per_field
+from data_reader import NameInterner, PackedSession, pack_session, file_digest
+
+
+DATA_DIRECTORY = "../experiment_data"
+CATALOG_FILE = "Basic_run_data.json"
+STORE_FILE = "../experiment_data/corpus.store"
+
+# e.g. Data-2addtl-RANDOMA.csv -> 2 additional names, RANDOM topology, version A
+RUN_FILE_PATTERN = re.compile(r"^Data-(\d+)addtl-([A-Z]+)([A-Z])\.csv$")
+
+
+def read_catalog(catalog_file=CATALOG_FILE):
+    """
+    Returns the catalog entries keyed by data file name. The catalog was
+    edited by hand, so it has a trailing comma and one run number used
+    twice. Both are tolerated here rather than silently dropping entries.
+    """
+    with open(catalog_file, "r") as f:
+        text = f.read()
+
+    text = re.sub(r",\s*([}\]])", r"\1", text)
+    entries = json.loads(text, object_pairs_hook=list)
+
+    catalog = {}
+    for run_number, entry in entries:
+        entry = dict(entry)
+        entry["Run_number"] = run_number
+        catalog[entry["Data_file_name"]] = entry
+    return catalog
+
+
+class Session():
+    """
+    One run of the experiment. The treatment and topology come from the file
+    name (which is how the scripts always recovered them), whether a global
+    convention emerged comes from the catalog. participant_data and
+    group_round_names are the two outputs of preanalysis_packing and are
+    None until the run is loaded.
+    """
+
+    def __init__(self, file_name, convention_emerged=None):
+
+        match = RUN_FILE_PATTERN.match(os.path.basename(file_name))
+        if match is None:
+            raise ValueError("Not a run data file: {}".format(file_name))
+
+        self.file_name = file_name
+        self.additional_names_count = int(match.group(1))
+        self.topology = match.group(2)
+        self.version = match.group(3)
+        self.convention_emerged = convention_emerged
+
+        self.run_name = "{}addtl-{}{}".format(self.additional_names_count,
+                                              self.topology, self.version)
+        self.network_topology_name = "{}{}.txt".format(self.topology, self.version)
+
+        self.participant_data = None
+        self.group_round_names = None
+
+    def __repr__(self):
+
+        return "Session({})".format(self.run_name)
+
+    @property
+    def key(self):
+
+        return (self.additional_names_count, self.topology, self.version,
+                self.convention_emerged)
+
+    @property
+    def run_key(self):
+        # Which run this is, without the catalog's labels, for anything that
+        # should not change when a run is relabeled (random streams, caches)
+        return (self.additional_names_count, self.topology, self.version)
+
+    @property
+    def loaded(self):
+
+        return self.participant_data is not None
+
+
+def load_session(file_name):
+    """ Worker process entry point: import and pack a single run."""
+
+    return preanalysis_packing(import_participants(file_name))
+
+
+def _matches(value, wanted):
+
+    if wanted is None:
+        return True
+    if isinstance(wanted, (list, tuple, set, frozenset)):
+        return value in wanted
+    return value == wanted
+
+
+class Corpus():
+
+    def __init__(self,
+                 data_directory=DATA_DIRECTORY,
+                 catalog_file=CATALOG_FILE,
+                 convention_runs=None,
+                 processes=None):
+        """
+        convention_runs optionally overrides the catalog's record of which runs
+        produced a convention with an explicit list of run names (e.g.
+        "2addtl-RANDOMA"). The figure scripts pass their own list, which
+        differs from the catalog for a couple of runs.
+        """
+
+        self.processes = processes
+        catalog = read_catalog(catalog_file)
+
+        self.sessions = []
+        for directory, sub, files in os.walk(data_directory):
+            for current_file_name in sorted(files):
+                if not RUN_FILE_PATTERN.match(current_file_name):
+                    continue
+
+                if convention_runs is not None:
+                    run_name = current_file_name.replace("Data-","").replace(".csv","")
+                    convention_emerged = run_name in convention_runs
+                elif current_file_name in catalog:
+                    convention_emerged = catalog[current_file_name]["Global_convention_emerged"].lower() == "true"
+                else:
+                    convention_emerged = None
+
+                self.sessions.append(Session("/".join([directory, current_file_name]),
+                                             convention_emerged))
+
+        self.sessions.sort(key=lambda session: session.file_name)
+        self.index = {session.key: session for session in self.sessions}
+
+    def __len__(self):
+
+        return len(self.sessions)
+
+    def __iter__(self):
+
+        return iter(self.sessions)
+
+    def load(self, sessions=None):
+        """
+        Loads (in a pool of worker processes) every run in sessions that isn't
+        loaded yet. Runs already in memory are never read again.
+        """
+        if sessions is None:
+            sessions = self.sessions
+        to_load = [session for session in sessions if not session.loaded]
+
+        if to_load:
+            with ProcessPoolExecutor(max_workers=self.processes) as executor:
+                results = executor.map(load_session,
+                                       [session.file_name for session in to_load])
+                for session, (participant_data, group_round_names) in zip(to_load, results):
+                    session.participant_data = participant_data
+                    session.group_round_names = group_round_names
+
+        return sessions
+
+    def select(self,
+               additional_names_count=None,
+               topology=None,
+               version=None,
+               convention_emerged=None,
+               load=True):
+        """
+        Returns the runs matching every given criterion. A criterion can be a
+        single value or a collection of accepted values, e.g.
+        corpus.select(additional_names_count=(1,2), topology="RANDOM")
+        """
+        sessions = [session for session in self.sessions
+                    if _matches(session.additional_names_count, additional_names_count)
+                    and _matches(session.topology, topology)
+                    and _matches(session.version, version)
+                    and _matches(session.convention_emerged, convention_emerged)]
+
+        if load:
+            self.load(sessions)
+        return sessions
+
+
+"""
+The multilevel model is fit on every run at once, so rather than one _MLM.csv
+per run, export_MLM writes a single long format file. Each row is one
+participant, led by the run level columns (run name, topology, version,
+additional names count and whether a convention emerged). The rows of each run
+are built in a worker process and written through one buffered csv writer.
+The unstructured names get as many columns as the largest additional names
+count among the exported runs, so every row is as wide as the header.
+"""
+MLM_RUN_COLUMNS = ["session", "network_type", "network_version",
+                   "additional_names_count", "convention_emerged"]
+
+def session_MLM_rows(arguments):
+    """ Worker process entry point: the MLM rows of one run."""
+
+    file_name, run_columns, keepers, names_per_field = arguments
+    return [run_columns + holder for holder in MLM_rows(file_name, keepers, names_per_field)]
+
+
+def export_MLM(output_file, sessions, processes=None, keepers=None):
+
+    if keepers is None:
+        keepers = schema_fields("MLM")
+
+    sessions = list(sessions)
+    names_per_field = MLM_names_per_field(session.additional_names_count for session in sessions)
+
+    jobs = []
+    for session in sessions:
+        convention = "" if session.convention_emerged is None else str(session.convention_emerged)
+        run_columns = [session.run_name, session.topology, session.version,
+                       str(session.additional_names_count), convention]
+        jobs.append((session.file_name, run_columns, keepers, names_per_field))
+
+    row_count = 0
+    with open(output_file, "w", newline="", buffering=1 << 20) as f:
+        writer = csv.writer(f)
+        writer.writerow(MLM_RUN_COLUMNS + MLM_column_names(keepers, names_per_field))
+
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            for rows in executor.map(session_MLM_rows, jobs):
+                writer.writerows(rows)
+                row_count += len(rows)
+
+    return row_count
+
+
+"""
+The corpus store is a single binary file holding the packed arrays of every run
+(see data_reader.pack_session) over one corpus wide name vocabulary. It is
+opened with mmap, so any number of analysis processes share one read-only copy
+of the data through the page cache instead of each parsing and holding its own
+nested dictionaries of strings.
+
+Layout: a magic string, then the raw arrays (each aligned to 64 bytes), then a
+JSON index with the vocabulary, the run metadata and the offset, dtype and shape
+of every array, then the length of that index and a closing magic string.
+Keeping the index at the end means new runs can be appended later without
+rewriting the arrays already in the file.
+"""
+STORE_MAGIC = b"EVCORPUS"
+INDEX_MAGIC = b"EVCINDEX"
+ARRAY_ALIGNMENT = 64
+STORED_ARRAYS = ("participant_ids", "names_played", "alters_played",
+                 "group_numbers", "unstructured", "partners")
+
+
+def pack_session_file(file_name):
+    """ Worker process entry point: import a run into its packed arrays."""
+
+    return pack_session(import_participants(file_name))
+
+
+def session_metadata(session):
+
+    return {"file_name": session.file_name,
+            "run_name": session.run_name,
+            "additional_names_count": session.additional_names_count,
+            "topology": session.topology,
+            "version": session.version,
+            "convention_emerged": session.convention_emerged}
+
+
+def _write_arrays(f, arrays):
+
+    layout = {}
+    for name, array in arrays.items():
+        f.write(b"\0" * (-f.tell() % ARRAY_ALIGNMENT))
+        array = np.ascontiguousarray(array)
+        layout[name] = [f.tell(), array.dtype.str, list(array.shape)]
+        f.write(array.tobytes())
+    return layout
+
+
+def _write_index(f, index):
+
+    data = json.dumps(index).encode("utf-8")
+    f.write(data)
+    f.write(struct.pack("<Q", len(data)))
+    f.write(INDEX_MAGIC)
+
+
+def _store_packed_sessions(f, index, vocabulary, sessions, packed_sessions):
+
+    for session, packed in zip(sessions, packed_sessions):
+        # moving the run's own name ids onto the corpus vocabulary; the
+        # trailing -1 keeps the padding id as padding
+        lookup = np.array([vocabulary.intern(name) for name in packed.interner.names] + [-1],
+                          dtype=np.int32)
+        arrays = {"participant_ids": packed.participant_ids,
+                  "names_played": lookup[packed.names_played],
+                  "alters_played": lookup[packed.alters_played],
+                  "group_numbers": packed.group_numbers,
+                  "unstructured": lookup[packed.unstructured],
+                  "partners": packed.partners}
+
+        entry = session_metadata(session)
+        entry["arrays"] = _write_arrays(f, arrays)
+        index["sessions"][session.run_name] = entry
+
+    index["vocabulary"] = vocabulary.names
+
+
+def pack_session_files(sessions, processes=None):
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(pack_session_file,
+                                 [session.file_name for session in sessions]))
+
+
+def write_store(store_file, sessions, processes=None):
+    """ Packs every run in sessions (in worker processes) into a new store."""
+
+    packed_sessions = pack_session_files(sessions, processes)
+
+    index = {"vocabulary": [], "sessions": {}}
+    temporary_file = store_file + ".tmp"
+    with open(temporary_file, "wb") as f:
+        f.write(STORE_MAGIC)
+        _store_packed_sessions(f, index, NameInterner(), sessions, packed_sessions)
+        _write_index(f, index)
+    os.replace(temporary_file, store_file)
+
+
+def read_store_index(buffer):
+
+    if buffer[:len(STORE_MAGIC)] != STORE_MAGIC or buffer[-len(INDEX_MAGIC):] != INDEX_MAGIC:
+        raise ValueError("Not a corpus store")
+
+    index_end = len(buffer) - len(INDEX_MAGIC) - 8
+    (index_length,) = struct.unpack("<Q", buffer[index_end:index_end + 8])
+    index = json.loads(bytes(buffer[index_end - index_length:index_end]).decode("utf-8"))
+    return index, index_end - index_length
+
+
+def append_store(store_file, sessions, processes=None):
+    """
+    Packs the runs in sessions and adds them to an existing store, replacing
+    any stored run of the same name. The old index is cut off, the new arrays
+    are written after the existing ones and a new index closes the file. The
+    arrays of a replaced run are left in place as dead space (write_store
+    makes a compact store again).
+
+    Like write_store, the new store is written to a temporary copy and moved
+    into place, so an interrupted append leaves the old store whole (and
+    readers that have it mapped keep a valid file).
+    """
+    if not os.path.exists(store_file):
+        return write_store(store_file, sessions, processes)
+
+    packed_sessions = pack_session_files(sessions, processes)
+
+    with open(store_file, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            index, index_start = read_store_index(buffer)
+        finally:
+            buffer.close()
+
+    # the ids already in the store keep their meaning
+    vocabulary = NameInterner()
+    for name in index["vocabulary"]:
+        vocabulary.intern(name)
+
+    temporary_file = store_file + ".tmp"
+    shutil.copyfile(store_file, temporary_file)
+    with open(temporary_file, "r+b") as f:
+        f.truncate(index_start)
+        f.seek(index_start)
+        _store_packed_sessions(f, index, vocabulary, sessions, packed_sessions)
+        _write_index(f, index)
+    os.replace(temporary_file, store_file)
+
+
+class StoredSession(PackedSession):
+    """
+    A packed run whose arrays are read-only views into the mapped store file.
+    It has the same run metadata attributes as corpus.Session.
+    """
+
+    def __init__(self, metadata, arrays, interner):
+
+        PackedSession.__init__(self, arrays["participant_ids"], arrays["names_played"],
+                               arrays["alters_played"], arrays["group_numbers"],
+                               arrays["unstructured"], interner,
+                               partners=arrays["partners"])
+        for key, value in metadata.items():
+            if key != "arrays":
+                setattr(self, key, value)
+
+    def __repr__(self):
+
+        return "StoredSession({})".format(self.run_name)
+
+
+class CorpusStore():
+
+    def __init__(self, store_file):
+
+        self.store_file = store_file
+        with open(store_file, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        index, _ = read_store_index(self.buffer)
+        self.metadata = index["sessions"]
+
+        # The vocabulary is shared by every run in the store
+        self.interner = NameInterner()
+        for name in index["vocabulary"]:
+            self.interner.intern(name)
+
+        self._sessions = {}
+
+    def __len__(self):
+
+        return len(self.metadata)
+
+    def __iter__(self):
+
+        return (self.session(run_name) for run_name in sorted(self.metadata))
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *exception):
+
+        self.close()
+
+    def close(self):
+
+        self._sessions = {}
+        try:
+            self.buffer.close()
+        except BufferError:
+            # arrays handed out earlier still point into the mapping; it is
+            # released once the last of them is garbage collected
+            pass
+
+    def session(self, run_name):
+
+        if run_name not in self._sessions:
+            metadata = self.metadata[run_name]
+            arrays = {}
+            for name, (offset, dtype, shape) in metadata["arrays"].items():
+                dtype = np.dtype(dtype)
+                count = int(np.prod(shape))
+                arrays[name] = np.frombuffer(self.buffer, dtype=dtype, count=count,
+                                             offset=offset).reshape(shape)
+            self._sessions[run_name] = StoredSession(metadata, arrays, self.interner)
+        return self._sessions[run_name]
+
+    def select(self,
+               additional_names_count=None,
+               topology=None,
+               version=None,
+               convention_emerged=None):
+        """ The same selection as Corpus.select, over the stored runs."""
+
+        return [self.session(run_name) for run_name, metadata in sorted(self.metadata.items())
+                if _matches(metadata["additional_names_count"], additional_names_count)
+                and _matches(metadata["topology"], topology)
+                and _matches(metadata["version"], version)
+                and _matches(metadata["convention_emerged"], convention_emerged)]
+
+
+"""
+New runs arrive as new data files. The ingest manifest records every run that
+went into the store along with the hash of its data file, so an incremental
+ingest only packs the runs that are new or whose file changed and appends them
+to the store (refreshing their session caches on the way). Adding one run
+costs one run's work. The manifest also keeps each file's size and
+modification time, and a file with both unchanged is taken to have its recorded
+hash, so only new or touched files are hashed again.
+"""
+class Manifest():
+
+    def __init__(self, manifest_file):
+
+        self.manifest_file = manifest_file
+        if os.path.exists(manifest_file):
+            with open(manifest_file, "r") as f:
+                self.sessions = json.load(f)["sessions"]
+        else:
+            self.sessions = {}
+
+    def digest(self, session):
+
+        entry = self.sessions.get(session.run_name)
+        return entry["digest"] if entry is not None else None
+
+    def record(self, session, digest, stats=None):
+
+        if stats is None:
+            stats = os.stat(session.file_name)
+        self.sessions[session.run_name] = {"file_name": session.file_name,
+                                           "digest": digest,
+                                           "size": stats.st_size,
+                                           "mtime_ns": stats.st_mtime_ns}
+
+    def current_digest(self, session, stats):
+        """ The data file's hash, from the manifest when the file looks untouched."""
+
+        entry = self.sessions.get(session.run_name)
+        if (entry is not None and entry.get("size") == stats.st_size
+                and entry.get("mtime_ns") == stats.st_mtime_ns):
+            return entry["digest"]
+        return file_digest(session.file_name)
+
+    def save(self):
+
+        temporary_file = self.manifest_file + ".tmp"
+        with open(temporary_file, "w") as f:
+            json.dump({"sessions": self.sessions}, f, indent=1, sort_keys=True)
+        os.replace(temporary_file, self.manifest_file)
+
+
+def manifest_file_for(store_file):
+
+    return store_file + ".manifest.json"
+
+
+def ingest(data_directory=DATA_DIRECTORY,
+           store_file=STORE_FILE,
+           incremental=True,
+           catalog_file=CATALOG_FILE,
+           convention_runs=None,
+           processes=None):
+    """
+    Brings the store up to date with the data directory and returns the runs
+    that were (re)packed. Without incremental, the store is rebuilt from
+    every run.
+    """
+    corpus = Corpus(data_directory, catalog_file, convention_runs, processes)
+
+    # an incremental ingest needs a store to add to
+    incremental = incremental and os.path.exists(store_file)
+
+    manifest = Manifest(manifest_file_for(store_file))
+    if not incremental:
+        manifest.sessions = {}
+
+    stats = {session.run_name: os.stat(session.file_name) for session in corpus}
+    digests = {session.run_name: manifest.current_digest(session, stats[session.run_name])
+               for session in corpus}
+    to_ingest = [session for session in corpus
+                 if manifest.digest(session) != digests[session.run_name]]
+
+    if not incremental:
+        write_store(store_file, to_ingest, processes)
+    elif to_ingest:
+        append_store(store_file, to_ingest, processes)
+
+    # every run is recorded again, so a file that was touched but not changed
+    # picks up its new modification time and isn't hashed next time
+    for session in corpus:
+        manifest.record(session, digests[session.run_name], stats[session.run_name])
+    manifest.save()
+
+    return to_ingest
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintain the corpus store of experiment runs.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subcommands.add_parser("ingest", help="pack the run data files into the corpus store")
+    ingest_parser.add_argument("--incremental", action="store_true",
+                               help="only pack new or changed runs and append them to the store")
+    ingest_parser.add_argument("--data-directory", default=DATA_DIRECTORY)
+    ingest_parser.add_argument("--store", default=STORE_FILE)
+    ingest_parser.add_argument("--catalog", default=CATALOG_FILE)
+    ingest_parser.add_argument("--processes", type=int, default=None)
+
+    arguments = parser.parse_args()
+    if arguments.command == "ingest":
+        ingested = ingest(arguments.data_directory, arguments.store,
+                          incremental=arguments.incremental,
+                          catalog_file=arguments.catalog,
+                          processes=arguments.processes)
+        print("Ingested {} run(s): {}".format(len(ingested),
+                                              ", ".join(session.run_name for session in ingested)))
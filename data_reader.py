@@ -2,8 +2,11 @@ import math
 import json
 import random
 import csv
+import hashlib
+import pickle
 from collections import defaultdict
 import os
+import numpy as np
 import matplotlib.pyplot as plt
 
 """
@@ -22,131 +25,426 @@ accessible for analysis.
 
 
 
-def import_file(file_name):
+"""
+Looking up every kept variable with header.index() is a linear scan of the
+368 column header for every field and every participant. Instead we build a
+"column plan" once per header layout: a list of (variable name, column index)
+pairs, one per keeper. Plans are stored by header and keeper list, so every
+session with the same Otree layout reuses it. A keeper missing from the header
+is an error, like it was for header.index(); a renamed Otree column must not
+quietly drop data.
+"""
+_column_plans = {}
 
-    # load of the list of variable names we actually want
-    with open("fields_to_keep_no_survey.csv","r") as f:
-        raw = csv.reader(f)
-        keepers = next(raw)
+def column_plan(header, keepers):
 
+    key = (tuple(header), tuple(keepers))
+    if key not in _column_plans:
+        # header.index() returns the first match, so we keep the first
+        # position of any duplicated column name too.
+        positions = {}
+        for index, name in enumerate(header):
+            positions.setdefault(name, index)
+
+        missing = [k for k in keepers if k not in positions]
+        if missing:
+            raise KeyError("Keeper columns not in the header: {}".format(", ".join(missing)))
+
+        _column_plans[key] = [(k, positions[k]) for k in keepers]
+
+    return _column_plans[key]
+
+
+"""
+Parsing the Otree CSV is by far the slowest part of loading a session, so the
+cleaned session is also saved in a binary (pickle) cache next to the data
+file. The cache is keyed by the file path, size, modification time and a hash
+of the file content (plus the keeper list and the kind of records, the dicts of
+import_file or the Participant records of import_participants) and is rebuilt whenever any of those
+change.
+"""
+SESSION_CACHE_DIRECTORY = ".session_cache"
+
+def file_digest(file_name):
+
+    digest = hashlib.sha1()
+    with open(file_name, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def session_cache_key(file_name, keepers, record_kind="dicts"):
+
+    stats = os.stat(file_name)
+    return (os.path.abspath(file_name),
+            stats.st_size,
+            stats.st_mtime_ns,
+            file_digest(file_name),
+            record_kind,
+            tuple(keepers))
+
+
+def session_cache_path(file_name, keepers, record_kind="dicts", cache_directory=None):
+
+    if cache_directory is None:
+        cache_directory = os.path.join(os.path.dirname(os.path.abspath(file_name)),
+                                       SESSION_CACHE_DIRECTORY)
+    # different keeper lists and record kinds get their own cache file
+    path_hash = hashlib.sha1(repr((os.path.abspath(file_name), record_kind,
+                                   tuple(keepers))).encode("utf-8")).hexdigest()
+    stem = os.path.basename(file_name).replace(".csv", "")
+    return os.path.join(cache_directory, "{}-{}.pickle".format(stem, path_hash[:12]))
+
+
+def load_cached_session(file_name, key, cache_directory=None):
+
+    try:
+        with open(session_cache_path(file_name, key[-1], key[-2], cache_directory), "rb") as f:
+            cached_key, cleaned_data = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+    if cached_key != key:
+        return None
+    return cleaned_data
+
+
+def store_cached_session(file_name, key, cleaned_data, cache_directory=None):
+
+    path = session_cache_path(file_name, key[-1], key[-2], cache_directory)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # writing to a temporary file first so an interrupted run never leaves a
+    # half written cache behind
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as f:
+        pickle.dump((key, cleaned_data), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_path, path)
+
+
+"""
+Both importers share a single pass, generator based reader. Rows are filtered
+and projected as they come off the CSV reader, so only one full Otree row is
+held in memory at a time:
+
+ - The third column in the data is an indicator of whether the participant
+   spot was active during the trial. Inactive spots are skipped.
+ - Some active participants are overflow participants who played by
+   themselves (because of the particulars of the Mechanical Turk platform).
+   They are identified by a group id above 12 and are skipped too.
+
+Each surviving row is yielded as (participant number, {variable: value}) with
+only the kept variables, or, when make_record is given, as (participant number,
+make_record(participant number, {variable: value})).
+"""
+def stream_participants(file_name, keepers, make_record=None):
 
-    massive_dic = {}
-    print("Importing {}".format(file_name))
     # standard load of csv data file.
     with open(file_name,"r") as f:
         data = csv.reader(f,dialect="excel")
         header = next(data)
-        turk_id_index = header.index("participant.mturk_worker_id")
         participant_number = header.index("instructions.1.player.index_trans")
+        group_id = header.index("coordinate.1.group.id_in_subsession")
+
+        plan = column_plan(header, keepers)
+
+        for row in data:
+            if row[2] == "Inactive":
+                continue
+            if int(row[group_id]) > 12:
+                continue
 
-        for i in data:
-            # The third column in the data is an indicator of whether
-            # the participant spot was active during the trial
-            if i[2] != "Inactive":
-                massive_dic[int(i[participant_number])] = i
-
-        indices = []
-        # Going through the header to find the indices of the variable
-        # nams we actually want to keep
-        for i in keepers:
-            indices.append(header.index(i))
-
-        # Now we just loop over the participants we need, grab the
-        # variables we need and pack them into a dictionary.
-        cleaned_data = {}
-        for i,j in massive_dic.items():
             holder = {}
-            for k in keepers:
-                try:
-                    holder[k] = j[header.index(k)]
-                except:
-                    pass
-            cleaned_data[i] = holder
+            for k, index in plan:
+                if index < len(row):
+                    holder[k] = row[index]
 
+            if make_record is not None:
+                yield int(row[participant_number]), make_record(int(row[participant_number]), holder)
+                continue
 
-        """
-        At this point, there are still active participants in the
-        data dictionary that we don't need (they are overflowed
-        participants who played by themselves). We need to identify
-        they and remove they. (We needed their data to properly
-        identify them. Specifically their group id needs to be less
-        than 12.
-        """
-        IDs_to_delete = []
-        for ID,info in cleaned_data.items():
-            group_id = info["coordinate.1.group.id_in_subsession"]
+            yield int(row[participant_number]), holder
+
+
+"""
+Each analysis declares the variables it needs as a named schema, and the
+reader only projects (and caches) those columns. Field templates use {r} for
+the round number and are expanded over the 25 rounds, e.g.
+"coordinate.{r}.player.display_name". A schema can also be given a loader
+instead of fields; it is called once, the first time the schema is used
+(that is how the hand-made "no_survey" keeper list is read).
+"""
+FIELD_SCHEMAS = {}
+_schema_loaders = {}
+
+def register_schema(name, fields=None, loader=None):
+
+    if loader is not None:
+        _schema_loaders[name] = loader
+        FIELD_SCHEMAS.pop(name, None)
+        return
+
+    expanded = []
+    for field in fields:
+        if "{r}" in field:
+            expanded.extend([field.format(r=i) for i in range(1,26)])
+        else:
+            expanded.append(field)
+    FIELD_SCHEMAS[name] = expanded
+
+
+def schema_fields(name):
+
+    if name not in FIELD_SCHEMAS:
+        if name not in _schema_loaders:
+            raise KeyError("Unknown field schema: {}".format(name))
+        register_schema(name, _schema_loaders[name]())
+    return FIELD_SCHEMAS[name]
+
+
+def load_keepers_file(file_name):
+
+    # load of the list of variable names we actually want
+    with open(file_name,"r") as f:
+        raw = csv.reader(f)
+        return next(raw)
+
+
+register_schema("no_survey", loader=lambda: load_keepers_file("fields_to_keep_no_survey.csv"))
+
+# The name dynamics figure (Game_dynamics_figure.compile_data)
+register_schema("dynamics", ["coordinate.{r}.player.display_name",
+                             "coordinate.{r}.player.success"])
+
+# What the multilevel model is fit on (import_file_for_MLM, corpus.export_MLM)
+register_schema("MLM", ["instructions.1.player.index_trans",
+                        "coordinate.{r}.player.display_name",
+                        "coordinate.{r}.player.alter",
+                        "coordinate.{r}.player.stigmergy",
+                        "coordinate.{r}.player.success",
+                        "coordinate.{r}.group.id_in_subsession"])
+
+
+def import_file(file_name, schema="no_survey", use_cache=True, cache_directory=None):
 
-            if int(group_id) > 12:
-                IDs_to_delete.append(ID)
-                #print("deleted",group_id)
-        # We don't delete immediately because Python doesn't like dictionaries
-        # being touched during any iterative process.
-        for ID in IDs_to_delete:
-            del cleaned_data[ID]
+    keepers = schema_fields(schema)
 
+    if use_cache:
+        key = session_cache_key(file_name, keepers)
+        cleaned_data = load_cached_session(file_name, key, cache_directory)
+        if cleaned_data is not None:
+            return cleaned_data
+
+    print("Importing {}".format(file_name))
+
+    # We just loop over the participants we need, with the variables
+    # we need, and pack them into a dictionary.
+    cleaned_data = {}
+    for participant, holder in stream_participants(file_name, keepers):
+        cleaned_data[participant] = holder
+
+    if use_cache:
+        store_cached_session(file_name, key, cleaned_data, cache_directory)
 
     return cleaned_data
 
 
-def import_file_for_MLM(file_name):
+"""
+The analysis only ever uses a handful of variables per round, so rather than
+a dictionary of several hundred string keys per participant, the reader can
+build a slotted Participant record with typed fields straight from the CSV
+row. The names are cleaned the same way preanalysis_packing always cleaned
+them (lowercased and stripped); rounds without unstructured names have an
+empty tuple.
+"""
+PARTICIPANT_TEMPLATES = ("coordinate.{}.player.display_name",
+                         "coordinate.{}.player.alter",
+                         "coordinate.{}.group.id_in_subsession",
+                         "coordinate.{}.player.stigmergy",
+                         "coordinate.{}.player.success")
+
+PARTICIPANT_FIELDS = [template.format(i) for template in PARTICIPANT_TEMPLATES
+                      for i in range(1,26)]
+
+register_schema("participant", [template.replace("{}", "{r}") for template in PARTICIPANT_TEMPLATES])
+
+
+class Participant():
+
+    __slots__ = ("participant_id", "names_played", "alters_played",
+                 "group_numbers", "unstructured", "successes")
+
+    def __init__(self, participant_id, names_played, alters_played,
+                 group_numbers, unstructured, successes):
+
+        self.participant_id = participant_id
+        self.names_played = names_played
+        self.alters_played = alters_played
+        self.group_numbers = group_numbers
+        self.unstructured = unstructured
+        self.successes = successes
+
+    def __repr__(self):
+
+        return "Participant({})".format(self.participant_id)
+
+    def __eq__(self, other):
+
+        return (isinstance(other, Participant) and
+                all(getattr(self, slot) == getattr(other, slot) for slot in self.__slots__))
+
+    def __getstate__(self):
+
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+
+    def __setstate__(self, state):
+
+        for slot, value in zip(self.__slots__, state):
+            setattr(self, slot, value)
+
+
+def participant_from_values(participant_id, values):
+    """
+    Builds a Participant from {variable: raw string} for the PARTICIPANT_FIELDS.
+    The fields are looked up by name, so a missing one is a KeyError rather than
+    every later field shifting into the wrong attribute. The success flags are
+    optional (an empty flag is None).
+    """
+    def by_round(template):
+        return [values[template.format(i)] for i in range(1,26)]
+
+    display_names = by_round("coordinate.{}.player.display_name")
+    alters = by_round("coordinate.{}.player.alter")
+    groups = by_round("coordinate.{}.group.id_in_subsession")
+    unstructured_strings = by_round("coordinate.{}.player.stigmergy")
+    successes = [values.get("coordinate.{}.player.success".format(i), "") for i in range(1,26)]
+
+    unstructured = []
+    for unstructured_string in unstructured_strings:
+        unstructured_string = unstructured_string.lower()
+        if unstructured_string != "":
+            unstructured.append(tuple(j.strip().lower() for j in unstructured_string.split(',')))
+        else:
+            unstructured.append(())
+
+    return Participant(participant_id,
+                       tuple(name.lower().strip() for name in display_names),
+                       tuple(name.lower().strip() for name in alters),
+                       tuple(int(group) for group in groups),
+                       tuple(unstructured),
+                       tuple(bool(int(success)) if success != "" else None
+                             for success in successes))
+
+
+def participant_record(participant_id, values):
+    """ The Participant record of one participant of import_file's output."""
+
+    if isinstance(values, Participant):
+        return values
+    return participant_from_values(participant_id, values)
+
+
+def import_participants(file_name, use_cache=True, cache_directory=None):
+    """
+    Like import_file, but returns {participant number: Participant}.
+    """
+    if use_cache:
+        key = session_cache_key(file_name, schema_fields("participant"), record_kind="records")
+        participants = load_cached_session(file_name, key, cache_directory)
+        if participants is not None:
+            return participants
 
-    participant_dictionary = {}
     print("Importing {}".format(file_name))
-    # standard load of csv data file.
-    with open(file_name,"r") as f:
-        data = csv.reader(f,dialect="excel")
-        header = next(data)
-        turk_id_index = header.index("participant.mturk_worker_id")
-        participant_number = header.index("instructions.1.player.index_trans")
 
-        for i in data:
-            # The third column in the data is an indicator of whether
-            # the participant spot was active during the trial
-            if i[2] != "Inactive":
-                participant_dictionary[int(i[participant_number])] = i
+    participants = {}
+    for participant, record in stream_participants(file_name, schema_fields("participant"),
+                                                   make_record=participant_from_values):
+        participants[participant] = record
 
-            # load of the list of variable names we actually want
-        with open("fields_to_keep_MLM.csv","r") as f:
-            raw = csv.reader(f)
-            keepers = next(raw)
+    if use_cache:
+        store_cached_session(file_name, key, participants, cache_directory)
 
-        column_names = ["network_type","network_version","additional_names_count"]
-        for column_name in keepers:
-            if "unstructured" in column_name:
-                new_name = column_name.replace("unstructured", "random_name_")
+    return participants
+
+
+"""
+The multilevel model wants the raw per round variables, one row per
+participant. The unstructured names (the "stigmergy" variables in Otree) are
+recorded as a single comma separated string, so they are split over
+"random_name_" columns, names_per_field of them (padded with empty strings).
+A run shows as many unstructured names as its additional names count, so a
+file with runs of up to three additional names needs three columns; there are
+always at least the original two.
+"""
+def is_unstructured_field(name):
+
+    return "unstructured" in name or "stigmergy" in name
+
+
+def MLM_names_per_field(additional_names_counts):
+
+    return max([2] + [int(count) for count in additional_names_counts])
+
+
+def MLM_column_names(keepers, names_per_field=2):
+
+    column_names = []
+    for column_name in keepers:
+        if is_unstructured_field(column_name):
+            new_name = column_name.replace("unstructured", "random_name_").replace("stigmergy", "random_name_")
+
+            for i in range(1, names_per_field + 1):
+                column_names.append(new_name+str(i))
+        else:
+            column_names.append(column_name)
+    return column_names
+
+
+def MLM_rows(file_name, keepers, names_per_field=2):
+
+    for participant, values in stream_participants(file_name, keepers):
+        holder = []
+        for k in keepers:
+            if is_unstructured_field(k):
+                names = values[k].split(",")
+                # a row wider than the header would corrupt the file
+                if len(names) > names_per_field:
+                    raise ValueError("{} has {} unstructured names in {}, the columns only fit {}".format(
+                        file_name, len(names), k, names_per_field))
+
+                holder.extend(names)
+                holder.extend([""]*(names_per_field - len(names)))
 
-                column_names.append(new_name+"1")
-                column_names.append(new_name+"2")
             else:
-                column_names.append(column_name)
+                holder.append(values[k])
+        yield holder
 
 
-        # Now we just loop over the participants we need, grab the
-        # variables we need and pack them into a dictionary.
-        new_file_name = file_name.replace(".csv","_MLM.csv")
+def import_file_for_MLM(file_name):
 
-        run_data = file_name.split("/")[-1].replace(".csv","").split("-")
-        print(run_data)
-        network_version = run_data[-1][-1]
-        network_type = run_data[-1][:-1]
-        additional_names_count = run_data[1][0]
+    print("Importing {}".format(file_name))
+
+    keepers = schema_fields("MLM")
 
-        with open(new_file_name,"w") as f:
-            f.write(",".join(column_names)+"\n")
-            for i,j in participant_dictionary.items():
-                if int(j[header.index("coordinate.1.group.id_in_subsession")]) <= 12:
-                    holder = [network_type, network_version,additional_names_count]
-                    for k in keepers:
-                        if "unstructured" in k:
-                            names = j[header.index(k)].split(",")
+    new_file_name = file_name.replace(".csv","_MLM.csv")
 
-                            holder.extend(names)
-                            if len(names) == 1:
-                                holder.append("")
+    run_data = file_name.split("/")[-1].replace(".csv","").split("-")
+    print(run_data)
+    network_version = run_data[-1][-1]
+    network_type = run_data[-1][:-1]
+    additional_names_count = run_data[1][0]
 
-                        else:
-                            holder.append(j[header.index(k)])
-                    f.write(",".join(holder)+"\n")
+    names_per_field = MLM_names_per_field([additional_names_count])
+    column_names = ["network_type","network_version","additional_names_count"]
+    column_names.extend(MLM_column_names(keepers, names_per_field))
+
+    # Each participant row is written as soon as it has been read.
+    with open(new_file_name,"w") as f:
+        f.write(",".join(column_names)+"\n")
+        for holder in MLM_rows(file_name, keepers, names_per_field):
+            holder = [network_type, network_version,additional_names_count] + holder
+            f.write(",".join(holder)+"\n")
 
 
 
@@ -163,9 +461,13 @@ def preanalysis_packing(game_data):
     # (participant, values) pairs. So the outer loop is for
     # individual participants
     for key, values in game_data.items():
-        participant_names_played = []
-        alter_names_played = []
-        group_numbers = []
+        # the game data can be import_file's dictionaries of variables or
+        # import_participants' records; either way we work from the record
+        record = participant_record(key, values)
+
+        participant_names_played = list(record.names_played)
+        alter_names_played = list(record.alters_played)
+        group_numbers = [str(group) for group in record.group_numbers]
         unstructured_names = []
         distro_by_round_no_unstructured = defaultdict(list)
         distro_by_round_unstructured = defaultdict(list)
@@ -175,29 +477,21 @@ def preanalysis_packing(game_data):
         for i in range(1,26):
 
             # The name the participant played that round
-            name_played = values["coordinate.{}.player.display_name".format(i)].lower().strip()
+            name_played = record.names_played[i-1]
             # adding to the list of all names played
             group_round_names[i].append(name_played)
-            # adding to the participant's own list
-            participant_names_played.append(name_played)
 
             # The name the participant's alter played
-            alter_name_played = values["coordinate.{}.player.alter".format(i)].lower().strip()
-            alter_names_played.append(alter_name_played)
-
-            group_numbers.append(values["coordinate.{}.group.id_in_subsession".format(i)].lower().strip())
-
-            # The additional "niche" names the participant was explored to.
-            unstructured_string = values["coordinate.{}.player.stigmergy".format(i)].lower()
+            alter_name_played = record.alters_played[i-1]
 
             # repacking
             all_round_names = [name_played,alter_name_played]
             distro_by_round_no_unstructured[i] = list(all_round_names)
 
-            # The niche names were recorded as a single string and are parsed here.
-            if unstructured_string != "":
-                stig = [j.strip().lower() for j in unstructured_string.split(',')]
-                unstructured_names.append(stig)
+            # The additional "niche" names the participant was explored to.
+            stig = record.unstructured[i-1]
+            if stig != ():
+                unstructured_names.append(list(stig))
                 all_round_names.extend(stig)
 
             distro_by_round_unstructured[i] = all_round_names
@@ -212,14 +506,152 @@ def preanalysis_packing(game_data):
                                   }
 
 
-    for key, values in participant_data.items():
-        actual_alters = {}
-        for round, group in enumerate(values["group_numbers"]):
-                for alter in range(24):
-                    if  alter != key and participant_data[alter]["group_numbers"][round] == group:
-                        actual_alters[round+1] = alter
-                        break
-        assert len(actual_alters) == 25
-        values["actual_alters"] = actual_alters
+    # Each round, the participant's actual alter is the other participant in
+    # the same group. The pairing is worked out for every round at once from
+    # a participants x rounds array of group ids.
+    participant_ids = sorted(participant_data)
+    group_numbers = np.array([[int(group) for group in participant_data[key]["group_numbers"]]
+                              for key in participant_ids], dtype=np.int32)
+    partners = pair_partners(group_numbers)
+    assert (partners >= 0).all()
+
+    for row, key in enumerate(participant_ids):
+        participant_data[key]["actual_alters"] = {game_round+1: participant_ids[partners[game_round, row]]
+                                                  for game_round in range(25)}
 
     return (participant_data, group_round_names)
+
+
+def pair_partners(group_numbers):
+    """
+    Takes a participants x rounds array of group ids and returns a rounds x
+    participants array with the row of each participant's partner that round
+    (-1 if the participant was alone in their group). When a group has more
+    than two members, the partner is the first other member in row order.
+    """
+    groups = np.asarray(group_numbers).T
+    round_count, participant_count = groups.shape
+    positions = np.arange(participant_count)
+
+    # sorting each round by group id (stable, so ties stay in row order)
+    order = np.argsort(groups, axis=1, kind="stable")
+    sorted_groups = np.take_along_axis(groups, order, axis=1)
+
+    # the position of the first member of every group
+    group_start = np.ones(groups.shape, dtype=bool)
+    group_start[:, 1:] = sorted_groups[:, 1:] != sorted_groups[:, :-1]
+    first = np.maximum.accumulate(np.where(group_start, positions, 0), axis=1)
+
+    # the first member's partner is the second member, everyone else's is the first
+    second = np.minimum(first + 1, participant_count - 1)
+    has_second = np.take_along_axis(sorted_groups, second, axis=1) == sorted_groups
+    has_second &= second != first
+    partner_position = np.where(positions == first, np.where(has_second, second, -1), first)
+
+    partners = np.full(groups.shape, -1, dtype=np.int32)
+    partner_rows = np.take_along_axis(order, np.maximum(partner_position, 0), axis=1)
+    partner_rows[partner_position < 0] = -1
+    np.put_along_axis(partners, order, partner_rows, axis=1)
+
+    return partners
+
+
+
+"""
+Every downstream count used to re-hash the lowercased name strings. Instead,
+names can be interned to small integers once. A NameInterner can be made per
+session or shared across the whole corpus (pass the same interner to every
+pack_session call) so the ids mean the same thing in every session.
+"""
+class NameInterner():
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name):
+        """ Returns the id of the name, adding it to the vocabulary if new."""
+        try:
+            return self.ids[name]
+        except KeyError:
+            self.ids[name] = len(self.names)
+            self.names.append(name)
+            return self.ids[name]
+
+    def name(self, name_id):
+
+        return self.names[name_id]
+
+
+"""
+The array version of preanalysis_packing. Rather than per participant lists
+of strings, the session is held in dense integer arrays with one row per
+participant (ordered by participant number) and one column per round:
+
+ - names_played, alters_played: participants x 25 name ids
+ - group_numbers: participants x 25 group ids
+ - unstructured: participants x 25 x k name ids, padded with -1 because
+   rounds (and treatments) have different numbers of unstructured names
+ - partners: 25 x participants rows of each participant's actual alter
+"""
+class PackedSession():
+
+    def __init__(self, participant_ids, names_played, alters_played,
+                 group_numbers, unstructured, interner, partners=None):
+
+        self.participant_ids = participant_ids
+        self.names_played = names_played
+        self.alters_played = alters_played
+        self.group_numbers = group_numbers
+        self.unstructured = unstructured
+        self.interner = interner
+        if partners is None:
+            partners = pair_partners(group_numbers)
+        self.partners = partners
+
+    def round_ids(self, with_unstructured=False):
+        """
+        The names a participant saw each round (their own and their alter's,
+        plus the unstructured names if asked) as a participants x 25 x names
+        array, the array counterpart of the distro_by_round dictionaries.
+        """
+        columns = [self.names_played[:, :, None], self.alters_played[:, :, None]]
+        if with_unstructured:
+            columns.append(self.unstructured)
+        return np.concatenate(columns, axis=2)
+
+
+def pack_session(game_data, interner=None):
+
+    if interner is None:
+        interner = NameInterner()
+
+    participant_ids = np.array(sorted(game_data), dtype=np.int32)
+    participant_count = len(participant_ids)
+
+    names_played = np.empty((participant_count, 25), dtype=np.int32)
+    alters_played = np.empty((participant_count, 25), dtype=np.int32)
+    group_numbers = np.empty((participant_count, 25), dtype=np.int32)
+    unstructured_by_round = []
+
+    for row, key in enumerate(participant_ids):
+        record = participant_record(int(key), game_data[int(key)])
+        for i in range(1,26):
+            names_played[row, i-1] = interner.intern(record.names_played[i-1])
+            alters_played[row, i-1] = interner.intern(record.alters_played[i-1])
+            group_numbers[row, i-1] = record.group_numbers[i-1]
+
+            if record.unstructured[i-1] != ():
+                unstructured_by_round.append((row, i-1, [interner.intern(j)
+                                                         for j in record.unstructured[i-1]]))
+
+    width = max([len(ids) for _, _, ids in unstructured_by_round], default=0)
+    unstructured = np.full((participant_count, 25, width), -1, dtype=np.int32)
+    for row, column, ids in unstructured_by_round:
+        unstructured[row, column, :len(ids)] = ids
+
+    return PackedSession(participant_ids, names_played, alters_played,
+                         group_numbers, unstructured, interner)
@@ -5,11 +5,13 @@ analysis happens via a different script.
 """
 
 import data_reader
-import math, random
+import os, math, random, hashlib, heapq
+import numpy as np
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 import matplotlib.pyplot as plt
 import network_build as nb
-from itertools import combinations
+from itertools import combinations, islice
 
 
 """
@@ -20,6 +22,10 @@ KL divergence measure with the same supports
 It calculates the KL from Q, the 'seen' distribution
 to P, the true distribution. It wants probability
 distributions, i.e. not raw counts.
+
+KL and JS are thin wrappers around the batched versions below, which take
+stacked (batch x vocabulary) probability matrices over a shared support and
+return one divergence per row.
 """
 def KL(seen_distribution, true_distribution):
 
@@ -27,120 +33,350 @@ def KL(seen_distribution, true_distribution):
   assert len(seen_distribution) == len(true_distribution)
 
   # summing across the categories of the distribution
-  KL = 0
-  for key, Pi in true_distribution.items():
-    Qi = seen_distribution[key]
-    KL -= Pi * math.log(Qi/Pi)
+  keys = list(true_distribution)
+  P = np.array([true_distribution[key] for key in keys], dtype=float)
+  Q = np.array([seen_distribution[key] for key in keys], dtype=float)
 
-  return KL
+  return float(KL_batch(Q, P))
 
 
 def JS(seen, true):
     """ Returns the JS divergence"""
 
-    M={}
-    for key, value in seen.items():
-        M[key] = (value + true[key])/2
+    keys = list(seen)
+    P = np.array([seen[key] for key in keys], dtype=float)
+    Q = np.array([true[key] for key in keys], dtype=float)
+
+    return float(JS_batch(P, Q))
+
 
+def KL_batch(seen, true):
+    """
+    KL divergence from each row of seen (Q) to the same row of true (P).
+    Categories where P is zero contribute nothing.
+    """
+    seen = np.asarray(seen, dtype=float)
+    true = np.asarray(true, dtype=float)
 
-    JS1 = 0
-    for key, p in seen.items():
-        q = M[key]
-        if q != 0 and p !=0:
-            JS1 -= p*math.log(q/p)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terms = np.where(true > 0, -true * np.log(seen / true), 0.)
+    return terms.sum(axis=-1)
 
-    JS2 = 0
-    for key, p in true.items():
-        q = M[key]
-        if q != 0 and p != 0:
-            JS2 -= p*math.log(q/p)
+
+def JS_batch(seen, true):
+    """ Row by row JS divergence of two stacked probability matrices."""
+    seen = np.asarray(seen, dtype=float)
+    true = np.asarray(true, dtype=float)
+    M = (seen + true)/2
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        JS1 = np.where((seen != 0) & (M != 0), -seen * np.log(M / seen), 0.).sum(axis=-1)
+        JS2 = np.where((true != 0) & (M != 0), -true * np.log(M / true), 0.).sum(axis=-1)
 
     return JS1*.5 + JS2*.5
 
 
+"""
+The divergences are kept in a registry by name, so the analysis code asks for
+divergence_type by name rather than branching on "JS" or "KL". Each measure has
+a batched kernel that takes the aligned (seen, log seen, true, log true)
+probability rows and returns one divergence per row (see
+aligned_log_probabilities), and a lower bound on what a row can come to when
+one of the two distributions only sums to least_mass (the smoothing takes
+some mass off the supporting distribution, see align_distributions). None
+means the measure is never negative.
+
+KL and JS are the ones the paper uses; Hellinger, total variation and
+Jeffreys (the symmetric KL) are there to compare against.
+"""
+class Divergence():
+
+    def __init__(self, name, kernel, lower_bound=None):
+
+        self.name = name
+        self.kernel = kernel
+        self.lower_bound = lower_bound
+
+    def floor(self, least_mass):
+
+        if self.lower_bound is None:
+            return 0.
+        return self.lower_bound(least_mass)
+
+
+DIVERGENCES = {}
+
+def register_divergence(name, kernel, lower_bound=None):
+
+    DIVERGENCES[name] = Divergence(name, kernel, lower_bound)
+
+
+def get_divergence(name):
+
+    if name not in DIVERGENCES:
+        raise KeyError("Unknown divergence: {}".format(name))
+    return DIVERGENCES[name]
+
+
+def KL_kernel(seen, log_seen, true, log_true):
+
+    with np.errstate(invalid="ignore"):
+        return np.where(true > 0, true*(log_true - log_seen), 0.).sum(axis=-1)
+
+
+def JS_kernel(seen, log_seen, true, log_true):
+
+    # the mixture is the only log that can't come from the count tables
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_M = np.log((seen + true)/2)
+        JS1 = np.where(seen > 0, seen*(log_seen - log_M), 0.).sum(axis=-1)
+        JS2 = np.where(true > 0, true*(log_true - log_M), 0.).sum(axis=-1)
+    return JS1*.5 + JS2*.5
+
+
+def hellinger_kernel(seen, log_seen, true, log_true):
+
+    return np.sqrt(.5*((np.sqrt(seen) - np.sqrt(true))**2).sum(axis=-1))
+
+
+def total_variation_kernel(seen, log_seen, true, log_true):
+
+    return .5*np.abs(seen - true).sum(axis=-1)
+
+
+def jeffreys_kernel(seen, log_seen, true, log_true):
+
+    return KL_kernel(seen, log_seen, true, log_true) + KL_kernel(true, log_true, seen, log_seen)
+
+
+def KL_lower_bound(least_mass):
+
+    # log sum inequality: sum p log(p/q) >= (sum p) log(sum p / sum q)
+    least_mass = max(least_mass, 1/math.e)
+    return min(0., least_mass*math.log(least_mass))
+
+
+register_divergence("KL", KL_kernel, KL_lower_bound)
+register_divergence("JS", JS_kernel)
+register_divergence("hellinger", hellinger_kernel)
+register_divergence("total_variation", total_variation_kernel)
+register_divergence("jeffreys", jeffreys_kernel)
+
+
+def divergence(seen_distribution, true_distribution, divergence_type="KL"):
+    """
+    Any registered divergence between two {name: probability} dictionaries over
+    the same support, e.g. from create_continuity_and_probabilities.
+    """
+    assert len(seen_distribution) == len(true_distribution)
+
+    keys = list(true_distribution)
+    seen = np.array([seen_distribution[key] for key in keys], dtype=float)
+    true = np.array([true_distribution[key] for key in keys], dtype=float)
+
+    with np.errstate(divide="ignore"):
+        return float(get_divergence(divergence_type).kernel(seen, np.log(seen), true, np.log(true)))
+
+
 """
 A specialized function for forcing two distributions to have the same
 support. It assumes the distribution with the more types has the correct
 full support. In virtual of how the distributions are defined, it is not
 possible for smaller of the two distributions to have names not in the
 larger one.
+
+The work is done by align_distributions on count vectors over a shared
+vocabulary; this dictionary version maps the names onto one and back. Note
+that it returns the distribution with fewer types first, which is the seen
+distribution except in the rare rounds where the seen names outnumber the
+true ones.
 """
-def create_continuity_and_probabilities(distro1, distro2):
-    # figuring out which distribution should establish the support
-    if len(distro1) > len(distro2):
-        supporting_distro = dict(distro1)
-        compared_distro = dict(distro2)
+def create_continuity_and_probabilities(distro1, distro2, smoothing=.001):
+
+    vocabulary = {}
+    for ky in list(distro1) + list(distro2):
+        vocabulary.setdefault(ky, len(vocabulary))
+
+    counts1 = counts_to_vector(distro1, vocabulary)
+    counts2 = counts_to_vector(distro2, vocabulary)
+    probabilities1, probabilities2 = align_distributions(counts1, counts2, smoothing=smoothing)
+
+    # figuring out which distribution established the support
+    if np.count_nonzero(counts1) > np.count_nonzero(counts2):
+        supporting, compared = probabilities1, probabilities2
     else:
-        supporting_distro = dict(distro2)
-        compared_distro = dict(distro1)
-    # finding which values are missing from the compared distribution (i.e. not supported)
-    missing_keys_seen = list(set(supporting_distro.keys()).difference(set(compared_distro.keys())))
-    missing_keys_true = list(set(compared_distro.keys()).difference(set(supporting_distro.keys())))
-
-    if missing_keys_true != []:
-        for ky in missing_keys_true:
-            if ky in supporting_distro.keys():
-                supporting_distro[ky] +=1
-            else:
-                supporting_distro[ky] = 1
+        supporting, compared = probabilities2, probabilities1
 
-    # the 'corrected' distribution assumes those missing names now all have a probability of .001
-    new_compared_distro = {i:.001 for i in missing_keys_seen}
+    new_compared_distro = {}
+    new_supporting_distro = {}
+    for ky, index in vocabulary.items():
+        if supporting[index] != 0:
+            new_compared_distro[ky] = float(compared[index])
+            new_supporting_distro[ky] = float(supporting[index])
 
-    # finding the number instances in the compared distribution
-    instance_count = sum(compared_distro.values())
+    return new_compared_distro, new_supporting_distro
 
-    # finding the number of categories with new weight of .001
-    instances_missing = len(missing_keys_seen)
 
+def counts_to_vector(distro, vocabulary):
     """
-    This loop corrects the compared distribution by re-weighting
-    the original frequencies so that it is like they came from a
-    sampling process in which the missing values were observed
-    once in a thousand samples.
+    The counts of a {name: count} dictionary as a vector indexed by the
+    vocabulary ({name: index}, e.g. a NameInterner's ids). A name that isn't
+    in the vocabulary means the two supports don't line up, which is an error.
     """
-    for ky, val in compared_distro.items():
+    vector = np.zeros(len(vocabulary), dtype=float)
+    for ky, val in distro.items():
+        if ky not in vocabulary:
+            raise ValueError("{!r} is not in the shared support".format(ky))
+        vector[vocabulary[ky]] = val
+    return vector
 
-        # true frequency
-        frequency = val/float(instance_count)
 
-        # count in 1000 value sample
-        weighted_count = frequency*1000
-
-        # subtracting for the missing instances in proportion to original weight
-        new_count = weighted_count - (instances_missing * frequency)
-        new_compared_distro[ky] = new_count/1000.
+def align_distributions(seen_counts, true_counts, smoothing=.001):
+    """
+    The vectorized smoothing rule, for a whole batch of (seen, true) count
+    rows over a shared vocabulary. Returns the (seen, true) probabilities.
+
+    For each row, the distribution with more types sets the support (the true
+    one on ties). Names only the other distribution has are added to it with a
+    count of one. The other distribution gets a probability of `smoothing` for
+    each name it is missing, as if they had been observed once in 1/smoothing
+    samples, and its observed frequencies are scaled down to make room. Names
+    neither distribution has stay at zero and are outside the support.
+    """
+    seen_counts = np.asarray(seen_counts, dtype=float)
+    true_counts = np.asarray(true_counts, dtype=float)
+    if seen_counts.shape != true_counts.shape:
+        raise ValueError("The seen and true counts have different supports: {} and {}".format(
+                          seen_counts.shape, true_counts.shape))
+    if (seen_counts < 0).any() or (true_counts < 0).any():
+        raise ValueError("Counts can't be negative")
+
+    seen_present = seen_counts > 0
+    true_present = true_counts > 0
+
+    # the distribution with more types supports (keeping the batch dims)
+    seen_supports = (seen_present.sum(axis=-1, keepdims=True) >
+                     true_present.sum(axis=-1, keepdims=True))
+    supporting = np.where(seen_supports, seen_counts, true_counts)
+    compared = np.where(seen_supports, true_counts, seen_counts)
+    supporting_present = np.where(seen_supports, seen_present, true_present)
+    compared_present = np.where(seen_supports, true_present, seen_present)
+
+    missing_from_compared = supporting_present & ~compared_present
+    missing_from_supporting = compared_present & ~supporting_present
+
+    # names only in the compared distribution get a count of one
+    supporting = supporting + missing_from_supporting
+
+    weight = 1/smoothing
+    new_compared = np.where(missing_from_compared, smoothing,
+                            _reweight(compared, missing_from_compared.sum(axis=-1, keepdims=True), weight))
+    new_supporting = _reweight(supporting, missing_from_supporting.sum(axis=-1, keepdims=True), weight)
+
+    seen = np.where(seen_supports, new_supporting, new_compared)
+    true = np.where(seen_supports, new_compared, new_supporting)
+    return seen, true
+
+
+def _reweight(counts, instances_missing, weight):
+    """
+    Re-weights the frequencies as if they came from a 1/smoothing sample in
+    which every missing name was observed once.
+    """
+    instance_count = counts.sum(axis=-1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        frequency = np.where(counts > 0, counts/instance_count, 0.)
 
+    # count in the weighted sample, less the missing instances in proportion to original weight
+    weighted_count = frequency*weight
+    new_count = weighted_count - (instances_missing * frequency)
+    return new_count/weight
 
-    """"Doing the same thing, but for the other distribution """
-    new_supporting_distro = {i:.001 for i in missing_keys_true}
 
-    # finding the number instances in the compared distribution
-    instance_count = sum(supporting_distro.values())
+"""
+The aligned probabilities are ratios of small integer counts (at most 24 x 25
+names in a window, plus the ones added for the support), scaled by the mass the
+smoothing leaves, so their logs come from a lookup table of integer logs
+rather than from taking the log of every probability. The table grows when a
+larger count turns up. Counts that aren't integers go through
+align_distributions and np.log.
+"""
+_log_table = np.zeros(0)
 
-    # finding the number of categories with new weight of .001
-    instances_missing = len(missing_keys_true)
+def log_table(largest):
 
-    for ky, val in supporting_distro.items():
+    global _log_table
+    if largest >= len(_log_table):
+        with np.errstate(divide="ignore"):
+            _log_table = np.log(np.arange(max(1024, 2*(largest + 1)), dtype=float))
+    return _log_table
 
-        # true frequency
-        frequency = val/float(instance_count)
 
-        # count in 1000 value sample
-        weighted_count = frequency*1000
+def aligned_log_probabilities(seen_counts, true_counts, smoothing=.001):
+    """
+    align_distributions, returning (seen, log seen, true, log true). Names
+    outside the support have a probability of 0 and a log of -inf.
+    """
+    seen_counts = np.asarray(seen_counts)
+    true_counts = np.asarray(true_counts)
+    if not (np.issubdtype(seen_counts.dtype, np.integer) and np.issubdtype(true_counts.dtype, np.integer)):
+        seen, true = align_distributions(seen_counts, true_counts, smoothing=smoothing)
+        with np.errstate(divide="ignore"):
+            return seen, np.log(seen), true, np.log(true)
+
+    if seen_counts.shape != true_counts.shape:
+        raise ValueError("The seen and true counts have different supports: {} and {}".format(
+                          seen_counts.shape, true_counts.shape))
+    if (seen_counts < 0).any() or (true_counts < 0).any():
+        raise ValueError("Counts can't be negative")
+
+    # the distribution with more types supports (the true one on ties); that is
+    # nearly always the true one, so those rows are redone the other way round
+    seen_supports = (np.count_nonzero(seen_counts, axis=-1) >
+                     np.count_nonzero(true_counts, axis=-1))
+
+    seen, log_seen, true, log_true = _smoothed_logs(seen_counts, true_counts, smoothing)
+    if seen_supports.any():
+        (true[seen_supports], log_true[seen_supports],
+         seen[seen_supports], log_seen[seen_supports]) = _smoothed_logs(true_counts[seen_supports],
+                                                                        seen_counts[seen_supports],
+                                                                        smoothing)
+    return seen, log_seen, true, log_true
+
+
+def _smoothed_logs(compared, supporting, smoothing):
+    """
+    The smoothing rule for integer count rows where supporting has the support,
+    returning (compared, log compared, supporting, log supporting).
+    """
+    compared_present = compared > 0
+    supporting_present = supporting > 0
+    missing_from_compared = supporting_present & ~compared_present
+    missing_from_supporting = compared_present & ~supporting_present
 
-        # subtracting for the missing instances in proportion to original weight
-        new_count = weighted_count - (instances_missing * frequency)
-        new_supporting_distro[ky] = new_count/1000.
+    # names only in the compared distribution get a count of one
+    supporting = supporting + missing_from_supporting
 
+    compared_total = compared.sum(axis=-1, keepdims=True)
+    supporting_total = supporting.sum(axis=-1, keepdims=True)
+    logs = log_table(int(max(compared_total.max(initial=0), supporting_total.max(initial=0))))
 
-    if set(new_compared_distro.keys()) != set(new_supporting_distro.keys()):
-        print("not the same")
-        print(distro1)
-        print(distro2)
+    def scaled(counts, total, instances_missing):
+        # count/total of what's left once the missing names have their share;
+        # absent names have a count of 0, so a log of -inf from the table
+        mass = 1 - instances_missing*smoothing
+        scale = np.divide(mass, total, out=np.zeros(total.shape), where=total > 0)
+        log_scale = np.log(scale, out=np.zeros(total.shape), where=total > 0)
+        return counts*scale, logs[counts] + log_scale
 
+    new_compared, log_compared = scaled(compared, compared_total,
+                                        missing_from_compared.sum(axis=-1, keepdims=True))
+    new_supporting, log_supporting = scaled(supporting, supporting_total,
+                                            missing_from_supporting.sum(axis=-1, keepdims=True))
 
-    return new_compared_distro, new_supporting_distro
+    new_compared[missing_from_compared] = smoothing
+    log_compared[missing_from_compared] = math.log(smoothing)
+    return new_compared, log_compared, new_supporting, log_supporting
 
 
 """
@@ -161,8 +397,17 @@ def impose_limited_memory(the_distro, memory_length=25):
 
     seen_distro_by_round = {}
 
+    # The names can also come as an array of interned name ids with
+    # one row per round (see data_reader.pack_session)
+    if isinstance(the_distro, np.ndarray):
+        windows = windowed_counts(the_distro, memory_length=memory_length)
+        for game_round in range(1,26):
+            seen_distro_by_round[game_round] = list_to_dict_of_counts(windows[game_round-1])
+        return seen_distro_by_round
+
     for game_round in range(1,26):
         last = 1 if game_round <= memory_length else game_round-memory_length
+
         new_list = []
         for theRound in range(last, game_round + 1):
             new_list.extend(the_distro[theRound])
@@ -174,590 +419,1380 @@ def impose_limited_memory(the_distro, memory_length=25):
 
 
 """
-A simple function for converting a raw list of
-instances into a dictionary with the associated count.
-The raw data comes as just a list.
+The array version of impose_limited_memory. Rather than re-counting every name
+in the window for each round, the counts are accumulated once over the rounds
+and each round's window is the difference of two rows of the running total.
+Like impose_limited_memory, the window for round r covers rounds
+max(1, r - memory_length) through r.
+
+ids_by_round is a (..., 25, names) array of name ids, padded with -1, and the
+result is a (..., 25, vocabulary) array of windowed counts.
 """
-def list_to_dict_of_counts(theList):
-    dct = defaultdict(int)
-    for name in theList:
-        dct[name] +=1
-    return dct
+def windowed_counts(ids_by_round, vocabulary_size=None, memory_length=25):
 
+    return window_differences(prefix_counts(round_counts(ids_by_round, vocabulary_size)),
+                              memory_length)
 
 
-"""
-Part of the analytical approach is to consider the informational gain related to having
-additional names. The actual name is a single instantiation of stochastic process, so we take a simulation approach, sampling from the possible names a participation could have seen many times and calculating the informational gainrelated to that new simulated "seen" distribution to get the bounds, average, and standard deviation of the information value of each additional name the
-participant sees.
-"""
-def simulate_information_gains(seen_distro,
-                                true_distro,
-                                divergence_type="KL",
-                                number_iterations = 200,
-                                with_replacement = False,
-                                graph = False,
-                                figure_name = "simulation_test.png",
-                                slope = True):
+def round_counts(ids_by_round, vocabulary_size=None):
+    """ (..., 25, vocabulary) counts of the names in each round."""
+    ids_by_round = np.asarray(ids_by_round)
+    if vocabulary_size is None:
+        vocabulary_size = int(ids_by_round.max(initial=-1)) + 1
 
-    # The baseline case is no simulated data, so we calculate the true
-    # KL and standard dev (none) and put it in our lists of values.
-    seen, true = create_continuity_and_probabilities(seen_distro, true_distro)
-    true_KL = KL(seen, true)
+    rows = int(np.prod(ids_by_round.shape[:-1]))
+    flat = ids_by_round.reshape(rows, -1)
+    keep = flat >= 0
+    positions = np.repeat(np.arange(rows), flat.shape[1]).reshape(flat.shape)[keep]*vocabulary_size + flat[keep]
 
-    divergence_avg = [true_KL]
+    counts = np.bincount(positions, minlength=rows*vocabulary_size)
+    return counts.reshape(ids_by_round.shape[:-1] + (vocabulary_size,))
 
-    # Now we find some information that we'll need inside the subsequent loop.
-    # We'll use this list for randomly sampling names
-    flat_list = []
-    for key, value in true_distro.items():
-        for i in range(value):
-            flat_list.append(key)
 
+def prefix_counts(counts_by_round):
+    """ Running totals over the rounds, with a leading row of zeros."""
+    counts_by_round = np.asarray(counts_by_round)
+    prefix = np.zeros(counts_by_round.shape[:-2] + (counts_by_round.shape[-2] + 1,
+                                                     counts_by_round.shape[-1]),
+                      dtype=counts_by_round.dtype)
+    np.cumsum(counts_by_round, axis=-2, out=prefix[..., 1:, :])
+    return prefix
 
-    # Starting the simulution process: Given the participants have seen 2 names (theirs and their partner's) and there are a total of 24 participants, the maximum # of additional names is 22.
-    for additional_names in range(1, 23):
 
-        true_seen_distro = defaultdict(int)
-        # Just copying over list of names actually seen.
-        for key, value in seen_distro.items():
-             true_seen_distro[key] = value
+def window_starts(memory_length, rounds=25):
+    """ The prefix row each round's window starts from."""
+    game_rounds = np.arange(1, rounds + 1)
+    return np.where(game_rounds <= memory_length, 1, game_rounds - memory_length) - 1
 
-        within_divergences = []
-        for i in range(number_iterations):
-            simulated_seen_distro = true_seen_distro.copy()
-            if with_replacement:
-                additional_names_list = random.choices(flat_list, k=additional_names) # with replacement
-            else:
-                additional_names_list= random.sample(flat_list, additional_names) #without replacement
 
-            for name in additional_names_list:
-                simulated_seen_distro[name] += 1
+def window_differences(prefix, memory_length):
 
+    rounds = prefix.shape[-2] - 1
+    return prefix[..., 1:, :] - prefix[..., window_starts(memory_length, rounds), :]
 
-            simulated_seen, true = create_continuity_and_probabilities(simulated_seen_distro, true_distro)
 
-            if divergence_type == "KL":
-                within_divergences.append(KL(simulated_seen, true))
-            else:
-                within_divergences.append(JS(simulated_seen, true))
+"""
+A simple function for converting a raw list of
+instances into a dictionary with the associated count.
+The raw data comes as just a list, or as an array of interned
+name ids, in which case the counting is done by bincount
+(-1 is the padding id and is not counted).
+"""
+def list_to_dict_of_counts(theList):
+    dct = defaultdict(int)
+    if isinstance(theList, np.ndarray):
+        counts = array_to_counts(theList)
+        for name_id in np.flatnonzero(counts):
+            dct[int(name_id)] = int(counts[name_id])
+        return dct
 
-        # Now that we simulated a bunch of different seen distributions, average them.
-        avg = sum(within_divergences) / len(within_divergences)
+    for name in theList:
+        dct[name] +=1
+    return dct
 
-        divergence_avg.append(avg)
 
-    return divergence_avg
+def array_to_counts(name_ids, vocabulary_size=0):
+    """ Counts of each name id as a vector, ignoring the -1 padding."""
+    name_ids = np.asarray(name_ids).ravel()
+    return np.bincount(name_ids[name_ids >= 0], minlength=vocabulary_size)
 
 
-def simulate_weakest_ties(participant_data,
-                            true_distro_by_round,
-                            network_topology_name,
-                            additional_name_count,
-                            divergence_type="JS",
-                            memory_length=5,
-                            graph=False):
+
+"""
+Every script picks one memory_length, so looking at how sensitive the results
+are to it used to mean re-running the whole pipeline once per value. The
+windows for any memory length are differences of the same running totals, so
+memory_sweep computes the windowed seen and true distributions, and the
+divergence between them, for every memory length in one pass. The result is a
+(memory length x round x participant) array of divergences, with participants
+in the row order of the packed session (see data_reader.pack_session).
+"""
+def memory_sweep(packed_session,
+                 memory_lengths=range(1,26),
+                 divergence_type="JS",
+                 with_unstructured=False,
+                 smoothing=.001):
     """
-    This method explores the informational value of signals from the "weakest links" and
-    compares that value to the value of the additional homogeneous mixing names. To do this,
-    we first get the "weakest", i.e. structurally distant, links for each node given the
-    network topology. There can be multiple such links so we just sample the required number.
+    The (memory lengths x rounds x participants) divergences of a packed session.
+    They come out of aligned_divergences, so in the rounds where the seen names
+    have more types than the true ones the divergence is taken the other way
+    round, like create_continuity_and_probabilities and divergence() do.
     """
+    vocabulary_size = len(packed_session.interner)
+    seen_prefix = prefix_counts(round_counts(packed_session.round_ids(with_unstructured),
+                                             vocabulary_size))
+    true_prefix = prefix_counts(round_counts(packed_session.names_played.T, vocabulary_size))
 
-    participant_differences = {}
+    # only the names that appear in this session matter (a corpus wide
+    # vocabulary can be much larger)
+    present = (seen_prefix[:, -1, :].sum(axis=0) + true_prefix[-1]) > 0
+    seen_prefix = seen_prefix[..., present]
+    true_prefix = true_prefix[..., present]
 
-    net = nb.net(network_topology_name)
-    weakest_links = net.calc_weakest_ties(additional_name_count)
+    # memory lengths x rounds
+    starts = np.stack([window_starts(memory_length) for memory_length in memory_lengths])
 
-    # We start by going through each participant
-    for participant, data in participant_data.items():
-        # and we're going to calculate the total divergence for each weakest link
+    # memory lengths x rounds x participants x vocabulary
+    seen = seen_prefix[:, 1:, :][:, None] - seen_prefix[:, starts, :]
+    seen = seen.transpose(1, 2, 0, 3)
+    true = (true_prefix[1:][None] - true_prefix[starts])[:, :, None, :]
+    true = np.broadcast_to(true, seen.shape)
 
-        # First we look at the overall divergence without unstructured names
-        div_no_unstructured_by_round = []
+    return aligned_divergences(seen, true, divergence_type=divergence_type, smoothing=smoothing)
 
-        distro_by_round_no_unstructured = impose_limited_memory(data["distro_by_round_no_unstructured"],
-                                                                memory_length=memory_length)
-        for game_round in range(1,26):
-
-            # a new list of names needs to be truncated to induce some memory
-            seen_distro_with_no_unstructured, true_distro = create_continuity_and_probabilities(
-                                                        distro_by_round_no_unstructured[game_round],
-                                                        true_distro_by_round[game_round])
-
-            # divergence between real and distro with additional names
-            if divergence_type == "JS":
-                div_no_unstructured_by_round.append(JS(seen_distro_with_no_unstructured, true_distro))
-            else:
-                div_no_unstructured_by_round.append(KL(seen_distro_with_no_unstructured, true_distro))
 
+"""
+Every random draw can come from a stream of its own, derived from one master seed and
+the key of what it is for: (session, participant, round, scenario), with None for the
+parts that don't apply. The key is hashed into the spawn key of a numpy SeedSequence,
+so the streams are independent of each other and of the order they are asked for in;
+a run split over processes or machines gives the same numbers as a serial one, and a
+result cached under a seed stays valid. numpy_stream gives a numpy Generator (the gain
+simulations), random_stream a random.Random (the comparators and network_build).
+With no master seed both hand back the unseeded default instead. The session part
+should say which run the data is and nothing else (the corpus uses Session.run_key),
+so relabeling a run in the catalog doesn't change its draws.
+"""
+def seed_sequence(master_seed, *key):
 
-        # Next we calculate the divergence for the real rounds with unstructured
-        div_with_unstructured_by_round = []
-
-        distro_by_round_unstructured = impose_limited_memory(data["distro_by_round_unstructured"],
-                                                                memory_length=memory_length)
-        for game_round in range(1,26):
-
-            # a new list of names needs to be truncated to induce some memory
-            seen_distro_with_unstructured, true_distro_2 = create_continuity_and_probabilities(
-                                                            distro_by_round_unstructured[game_round],
-                                                            true_distro_by_round[game_round])
-            # divergence between real and distro with additional names
-            if divergence_type == "JS":
-                div_with_unstructured_by_round.append(JS(seen_distro_with_unstructured, true_distro_2))
-            else:
-                div_with_unstructured_by_round.append(KL(seen_distro_with_unstructured, true_distro_2))
+    digest = hashlib.sha1(repr(_plain_key(key)).encode("utf-8")).digest()
+    words = tuple(int.from_bytes(digest[i:i + 4], "little") for i in range(0, len(digest), 4))
+    return np.random.SeedSequence(master_seed, spawn_key=words)
 
-        names_to_add_by_round = defaultdict(list)
-        for new_alter in weakest_links[participant]:
-            # We get the name played by the partic. and append it to lists of names for each round
-            for round, name in enumerate(participant_data[new_alter]["names_played"]):
-                 names_to_add_by_round[round].append(name)
 
-        # We go through round by round and add in the newly visible names
-        simulated_distro_by_round = {}
+def _plain_key(part):
 
-        for game_round in range(1,26):
-            no_unstructured = list(data["distro_by_round_no_unstructured"][game_round])
-            no_unstructured.extend(names_to_add_by_round[game_round])
-            simulated_distro_by_round[game_round] = no_unstructured
+    # numpy scalars print differently between numpy versions, so the key is made of plain values
+    if isinstance(part, np.generic):
+        return part.item()
+    if isinstance(part, (tuple, list)):
+        return tuple(_plain_key(item) for item in part)
+    return part
 
-        # That new list of names needs to be truncated to induce some memory
-        distro_by_round_weakest_link = impose_limited_memory(simulated_distro_by_round,
-                                                             memory_length=memory_length)
 
-        divergence_weakest_by_round = []
-        for game_round in range(1,26):
+def numpy_stream(master_seed, *key):
 
-            seen_distro_weakest_link, true_distro = create_continuity_and_probabilities(
-                                            distro_by_round_weakest_link[game_round],
-                                            true_distro_by_round[game_round])
+    if master_seed is None:
+        return np.random.default_rng()
+    return np.random.default_rng(seed_sequence(master_seed, *key))
 
 
-            # Then we calculate the divergence from distro with weakest link to true distro
-            if divergence_type == "JS":
-                div_with_weakest_link = JS(seen_distro_weakest_link, true_distro)
-            else:
-                div_with_weakest_link = KL(seen_distro_weakest_link, true_distro)
-            divergence_weakest_by_round.append(div_with_weakest_link)
+def random_stream(master_seed, *key):
 
-        game_diffs = [i-j for i, j in zip(divergence_weakest_by_round,div_with_unstructured_by_round)]
+    if master_seed is None:
+        return random
+    state = seed_sequence(master_seed, *key).generate_state(4, dtype=np.uint32)
+    return random.Random(int.from_bytes(state.tobytes(), "little"))
 
 
+"""
+Part of the analytical approach is to consider the informational gain related to having
+additional names. The actual name is a single instantiation of stochastic process, so we take a simulation approach, sampling from the possible names a participation could have seen many times and calculating the informational gainrelated to that new simulated "seen" distribution to get the bounds, average, and standard deviation of the information value of each additional name the
+participant sees.
 
-        divergence_ratio = [1 - actual/total if total !=0 else 0 for actual, total in zip(div_with_unstructured_by_round, div_no_unstructured_by_round)]
+The sampling is done on count vectors: drawing n names from the true distribution without
+replacement is a multivariate hypergeometric draw over the true counts (a multinomial one
+with replacement), so all the iterations for a number of names are drawn at once with a
+numpy Generator (rng, a fresh one if not given) and their divergences come out of one
+matrix operation. The first value is the divergence with no additional names. For a
+reproducible run, pass rng=numpy_stream(master_seed, session, participant, round, "gains").
+"""
+def simulate_information_gains(seen_distro,
+                                true_distro,
+                                divergence_type="KL",
+                                number_iterations = 200,
+                                with_replacement = False,
+                                graph = False,
+                                figure_name = "simulation_test.png",
+                                slope = True,
+                                rng = None,
+                                exact = False,
+                                max_compositions = 1000,
+                                target_sem = None):
+
+    vocabulary = {}
+    for ky in list(seen_distro) + list(true_distro):
+        vocabulary.setdefault(ky, len(vocabulary))
+    seen_counts = counts_to_vector(seen_distro, vocabulary).astype(np.int64)
+    true_counts = counts_to_vector(true_distro, vocabulary).astype(np.int64)
+
+    divergence_avg = simulate_gains(seen_counts[None, :], true_counts,
+                                    divergence_type=divergence_type,
+                                    number_iterations=number_iterations,
+                                    with_replacement=with_replacement,
+                                    rng=rng,
+                                    exact=exact,
+                                    max_compositions=max_compositions,
+                                    target_sem=target_sem)
+
+    return [float(avg) for avg in divergence_avg[:, 0]]
+
+
+def sample_additional_names(true_counts, additional_names, size, with_replacement=False, rng=None):
+    """ (size x vocabulary) counts of additional_names names drawn from the true counts."""
+    if rng is None:
+        rng = np.random.default_rng()
+
+    if with_replacement:
+        return rng.multinomial(additional_names, true_counts/true_counts.sum(), size=size)
+    check_drawable(true_counts, additional_names)
+    return rng.multivariate_hypergeometric(true_counts, additional_names, size=size)
+
+
+def check_drawable(true_counts, additional_names):
+    """ Without replacement there have to be enough names in the true distribution to draw."""
+    available = int(np.sum(true_counts))
+    if additional_names > available:
+        raise ValueError("Can't draw {} additional names without replacement from the {} "
+                         "in the true distribution".format(additional_names, available))
+
+
+def simulate_gains(seen_counts,
+                   true_counts,
+                   divergence_type="KL",
+                   number_iterations=200,
+                   with_replacement=False,
+                   rng=None,
+                   smoothing=.001,
+                   max_additional_names=22,
+                   exact=False,
+                   max_compositions=1000,
+                   target_sem=None,
+                   block_size=50,
+                   max_iterations=5000,
+                   return_iterations=False,
+                   memo=None):
+    """
+    The average divergence for 0 to max_additional_names additional names, for
+    each row of seen_counts (participants x vocabulary) against one true count
+    vector. Returns (max_additional_names + 1) x participants. With exact, the
+    averages are expectations wherever there are at most max_compositions ways
+    the names could come out (see expected_divergence), and sampled elsewhere.
+
+    With a target_sem the sampled cells take number_iterations' place with
+    adaptive_averages. return_iterations also returns how many draws each
+    average took, in the same shape (0 for the first row and exact cells).
+    memo is where the exact expectations are kept; pass the same dict to share
+    them between calls.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    if memo is None:
+        memo = {}
+
+    seen_counts = np.asarray(seen_counts, dtype=np.int64)
+    true_counts = np.asarray(true_counts, dtype=np.int64)
+
+    averages = np.zeros((max_additional_names + 1, len(seen_counts)))
+    iterations = np.zeros((max_additional_names + 1, len(seen_counts)), dtype=np.int64)
+    averages[0] = aligned_divergences(seen_counts, np.broadcast_to(true_counts, seen_counts.shape),
+                                      divergence_type=divergence_type, smoothing=smoothing)
+
+    # Given the participants have seen 2 names (theirs and their partner's) and there are a total
+    # of 24 participants, the maximum # of additional names is 22.
+    for additional_names in range(1, max_additional_names + 1):
+        sampled = np.ones(len(seen_counts), dtype=bool)
+        if exact:
+            for row, seen in enumerate(seen_counts):
+                expectation = expected_divergence(seen, true_counts, additional_names,
+                                                  divergence_type=divergence_type,
+                                                  with_replacement=with_replacement,
+                                                  smoothing=smoothing,
+                                                  max_compositions=max_compositions,
+                                                  memo=memo)
+                if expectation is not None:
+                    averages[additional_names, row] = expectation
+                    sampled[row] = False
+            if not sampled.any():
+                continue
+
+        if target_sem is not None:
+            averages[additional_names, sampled], iterations[additional_names, sampled] = adaptive_averages(
+                seen_counts[sampled], true_counts, additional_names,
+                target_sem,
+                divergence_type=divergence_type,
+                with_replacement=with_replacement,
+                rng=rng,
+                smoothing=smoothing,
+                block_size=block_size,
+                max_iterations=max_iterations)
+            continue
+
+        draws = sample_additional_names(true_counts, additional_names,
+                                        (int(sampled.sum()), number_iterations),
+                                        with_replacement=with_replacement, rng=rng)
+        simulated = seen_counts[sampled][:, None, :] + draws
+        divergences = aligned_divergences(simulated, np.broadcast_to(true_counts, simulated.shape),
+                                          divergence_type=divergence_type, smoothing=smoothing)
+        averages[additional_names, sampled] = divergences.mean(axis=1)
+        iterations[additional_names, sampled] = number_iterations
+
+    if return_iterations:
+        return averages, iterations
+    return averages
 
-        #print("comparison:", divergence_weakest_by_round)
-        #print("base_diff:", div_no_unstructured_by_round)
-        #print("ratio:", divergence_ratio)
 
-        participant_differences[participant] = (game_diffs,
-                                                weakest_links[participant],
-                                                div_no_unstructured_by_round,
-                                                divergence_ratio)
+"""
+A fixed 200 draws is too many for a round where the convention has settled (every draw
+gives nearly the same divergence) and too few for the early rounds. The adaptive mode
+draws in blocks of block_size and keeps going only for the rows whose standard error of
+the mean is still at or above target_sem, up to max_iterations.
+"""
+def adaptive_averages(seen_counts,
+                      true_counts,
+                      additional_names,
+                      target_sem,
+                      divergence_type="KL",
+                      with_replacement=False,
+                      rng=None,
+                      smoothing=.001,
+                      block_size=50,
+                      max_iterations=5000):
+    """ Returns the average divergence of each row and the number of draws it took."""
+    if rng is None:
+        rng = np.random.default_rng()
+    # the standard error needs at least two draws
+    block_size = max(2, block_size)
+    max_iterations = max(2, max_iterations)
+
+    totals = np.zeros(len(seen_counts))
+    squares = np.zeros(len(seen_counts))
+    counts = np.zeros(len(seen_counts), dtype=np.int64)
+    active = np.arange(len(seen_counts))
+    while len(active):
+        # the rows still going have all had the same number of draws, and the last
+        # block is cut short so none of them goes past max_iterations
+        size = min(block_size, max_iterations - counts[active[0]])
+        draws = sample_additional_names(true_counts, additional_names, (len(active), size),
+                                        with_replacement=with_replacement, rng=rng)
+        simulated = seen_counts[active][:, None, :] + draws
+        divergences = aligned_divergences(simulated, np.broadcast_to(true_counts, simulated.shape),
+                                          divergence_type=divergence_type, smoothing=smoothing)
+        totals[active] += divergences.sum(axis=1)
+        squares[active] += (divergences**2).sum(axis=1)
+        counts[active] += size
+
+        drawn = counts[active]
+        means = totals[active]/drawn
+        variances = np.maximum(squares[active]/drawn - means**2, 0)*drawn/(drawn - 1)
+        finished = (np.sqrt(variances/drawn) < target_sem) | (drawn >= max_iterations)
+        active = active[~finished]
+
+    return totals/counts, counts
 
-    return participant_differences
 
+"""
+Drawing a handful of names from a true distribution with only a few names in it
+has few possible outcomes, and there the expected divergence can be computed
+exactly rather than sampled: every way the n names can be split over the names
+in the true distribution (a composition) is enumerated with its multivariate
+hypergeometric probability (multinomial with replacement) and the divergences are
+averaged with those weights.
+
+The answer only depends on the (seen, true) count pairs and not on which name has
+which, so the expectations are kept in memo (a dict the caller passes in) by the
+sorted pairs with n, replacement, the divergence, the smoothing and the bound, and
+participants and rounds with the same counts are only computed once. simulate_gains
+keeps one memo per call, simulate_gain_surface one per session, so nothing outlives
+the simulation. When there are more than max_compositions compositions
+expected_divergence returns None and the caller samples instead.
+"""
 
-def find_non_neighbors_with_most_info(participant_data,
-                                    true_distro_by_round,
-                                    network_topology_name,
-                                    additional_names_count,
-                                    divergence_type="JS",
-                                    memory_length=5,
-                                    graph=False):
+def expected_divergence(seen_counts,
+                        true_counts,
+                        additional_names,
+                        divergence_type="KL",
+                        with_replacement=False,
+                        smoothing=.001,
+                        max_compositions=1000,
+                        memo=None):
+
+    if memo is None:
+        memo = {}
+
+    pairs = tuple(sorted((int(seen), int(true)) for seen, true in zip(seen_counts, true_counts)
+                         if seen > 0 or true > 0))
+    # the bound is part of the key: "too many" under one bound isn't under a larger one
+    key = (pairs, additional_names, with_replacement, divergence_type, smoothing, max_compositions)
+    if key in memo:
+        return memo[key]
+
+    seen = np.array([pair[0] for pair in pairs], dtype=np.int64)
+    true = np.array([pair[1] for pair in pairs], dtype=np.int64)
+
+    if not with_replacement:
+        check_drawable(true, additional_names)
+
+    # only names in the true distribution can be drawn
+    drawable = np.flatnonzero(true)
+    caps = [additional_names if with_replacement else int(true[i]) for i in drawable]
+    # stars and bars bounds the count, and is enough when the caps cannot bind
+    bound = math.comb(additional_names + len(caps) - 1, len(caps) - 1) if caps else 0
+    if bound > max_compositions and count_compositions(caps, additional_names) > max_compositions:
+        # remembered as well, so the counting is not redone for the next participant
+        memo[key] = None
+        return None
+
+    compositions = enumerate_compositions(caps, additional_names)
+    drawn = true[drawable]
+    total = int(drawn.sum())
+    factorials = log_factorials(max(total, additional_names))
+    if with_replacement:
+        log_probabilities = (factorials[additional_names]
+                             - factorials[compositions].sum(axis=1)
+                             + (compositions*np.log(drawn/total)).sum(axis=1))
+    else:
+        log_probabilities = ((factorials[drawn] - factorials[compositions]
+                              - factorials[drawn - compositions]).sum(axis=1)
+                             - (factorials[total] - factorials[additional_names]
+                                - factorials[total - additional_names]))
+
+    simulated = np.repeat(seen[None, :], len(compositions), axis=0)
+    simulated[:, drawable] += compositions
+    divergences = aligned_divergences(simulated, np.broadcast_to(true, simulated.shape),
+                                      divergence_type=divergence_type, smoothing=smoothing)
+
+    expectation = float((np.exp(log_probabilities)*divergences).sum())
+    memo[key] = expectation
+    return expectation
+
+
+def log_factorials(largest):
+    """ log(k!) for k = 0..largest, from the log table."""
+    return np.concatenate([[0.], np.cumsum(log_table(largest)[1:largest + 1])])
+
+
+def count_compositions(caps, total):
+    """ The number of ways to split total into parts with 0 <= part i <= caps[i]."""
+    ways = [1] + [0]*total
+    for cap in caps:
+        # running sums turn "add 0..cap" into two lookups
+        running = 0
+        new_ways = []
+        for filled in range(total + 1):
+            running += ways[filled]
+            if filled - cap - 1 >= 0:
+                running -= ways[filled - cap - 1]
+            new_ways.append(running)
+        ways = new_ways
+    return ways[total]
+
+
+def enumerate_compositions(caps, total):
+    """ All the splits counted by count_compositions, one per row."""
+    # how much the remaining parts can still take
+    room_after = [sum(caps[i + 1:]) for i in range(len(caps))]
+
+    rows = np.zeros((1, 0), dtype=np.int64)
+    remaining = np.array([total], dtype=np.int64)
+    for cap, room in zip(caps, room_after):
+        low = np.maximum(remaining - room, 0)
+        high = np.minimum(remaining, cap)
+        choices = high - low + 1
+        parent = np.repeat(np.arange(len(rows)), choices)
+        offsets = np.arange(choices.sum()) - np.repeat(np.cumsum(choices) - choices, choices)
+        part = low[parent] + offsets
+        rows = np.hstack([rows[parent], part[:, None]])
+        remaining = remaining[parent] - part
+    return rows
+
+
+def simulate_gain_surface(participant_data,
+                          true_distro_by_round,
+                          memory_length=8,
+                          divergence_type="KL",
+                          number_iterations=200,
+                          with_replacement=False,
+                          rng=None,
+                          exact=False,
+                          max_compositions=1000,
+                          target_sem=None,
+                          block_size=50,
+                          max_iterations=5000,
+                          return_iterations=False,
+                          seed=None,
+                          session_key=None):
     """
-    Rather than find the "weakest" ties like in simulate_weakest_ties, I just look at all
-    non-neighbors and the information they possess relative to the ego. The ones with the most information become the baseline.
-
-    When the additional names is more than one, the information yielded is calculated from the joint distribution of both (or all three) additional names. That means we need to look at all combos.
+    simulate_information_gains for every participant and round of a session at once,
+    from the seen names without the unstructured ones. Returns a
+    (round x number of additional names x participant) array, 25 x 23 x participants,
+    with the participants in participant_data order, and with return_iterations
+    the draws behind each cell in the same shape.
+
+    With a master seed each round draws from numpy_stream(seed, session_key, None,
+    round, "gains") instead of rng, session_key being the run (Session.run_key). The participants of a round share the stream
+    because their names are drawn together.
     """
+    if rng is None:
+        rng = np.random.default_rng()
+
+    arrays = SessionCounts(participant_data, true_distro_by_round)
+    seen_windows = window_differences(prefix_counts(arrays.base_counts), memory_length)
+
+    surface = np.zeros((25, 23, len(participant_data)))
+    iterations = np.zeros((25, 23, len(participant_data)), dtype=np.int64)
+    # one memo for the session's exact expectations, dropped when we return
+    memo = {}
+    for game_round in range(25):
+        surface[game_round], iterations[game_round] = simulate_gains(
+            seen_windows[:, game_round], arrays.true_counts[game_round],
+            divergence_type=divergence_type,
+            number_iterations=number_iterations,
+            with_replacement=with_replacement,
+            rng=rng if seed is None else numpy_stream(seed, session_key, None, game_round + 1, "gains"),
+            exact=exact,
+            max_compositions=max_compositions,
+            target_sem=target_sem,
+            block_size=block_size,
+            max_iterations=max_iterations,
+            return_iterations=True,
+            memo=memo)
+
+    if return_iterations:
+        return surface, iterations
+    return surface
 
-    participant_differences = {}
 
-    net = nb.net(network_topology_name)
+"""
+The gain surfaces of the whole corpus take a while to simulate, and the figure only
+regroups them. gain_surfaces simulates the sessions not already in the surface cache
+in a pool of worker processes and stores each one as an npz file (the surface, the
+draws behind each cell and the participants in row order) named by a hash of the
+session key, a fingerprint of its data and every simulation setting. Re-plotting, or
+sorting the sessions into different groups, then reads the files back; changing a
+setting or the data simply misses the cache.
+"""
+GAIN_CACHE_DIRECTORY = "../experiment_data/gain_surfaces"
 
-    # We start by going through each participant
-    for participant, data in participant_data.items():
-        # and we're going to calculate the divergences for combo of additional names
+class SurfaceCache():
 
-        # First we look at the overall divergence without unstructured names
-        div_no_unstructured_by_round = []
+    def __init__(self, directory=GAIN_CACHE_DIRECTORY):
 
-        distro_by_round_no_unstructured = impose_limited_memory(data["distro_by_round_no_unstructured"],
-                                                                memory_length=memory_length)
-        for game_round in range(1,26):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
 
-            # a new list of names needs to be truncated to induce some memory
-            seen_distro_with_no_unstructured, true_distro = create_continuity_and_probabilities(
-                                                        distro_by_round_no_unstructured[game_round],
-                                                        true_distro_by_round[game_round])
+    def file_for(self, key):
 
-            # KL divergence between real and distro with additional names
-            if divergence_type == "JS":
-                div_no_unstructured_by_round.append(JS(seen_distro_with_no_unstructured, true_distro))
-            else:
-                div_no_unstructured_by_round.append(KL(seen_distro_with_no_unstructured, true_distro))
+        digest = hashlib.sha1(repr(_plain_key(key)).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest + ".npz")
 
-        # Then we calculate the divergence for the real rounds with unstructured
+    def get(self, key):
 
-        div_with_unstructured_by_round = []
+        file_name = self.file_for(key)
+        if not os.path.exists(file_name):
+            return None
+        with np.load(file_name) as arrays:
+            return arrays["surface"], arrays["iterations"], arrays["participants"].tolist()
 
-        distro_by_round_unstructured = impose_limited_memory(data["distro_by_round_unstructured"],
-                                                                memory_length=memory_length)
-        for game_round in range(1,26):
+    def put(self, key, surface, iterations, participants):
 
-            # a new list of names needs to be truncated to induce some memory
-            seen_distro_with_unstructured, true_distro_2 = create_continuity_and_probabilities(
-                                                            distro_by_round_unstructured[game_round],
-                                                            true_distro_by_round[game_round])
+        # written aside and moved into place, so a crash never leaves half a file
+        file_name = self.file_for(key)
+        temporary_file = file_name[:-len(".npz")] + ".tmp.npz"
+        np.savez(temporary_file, surface=surface, iterations=iterations,
+                 participants=np.array(participants))
+        os.replace(temporary_file, file_name)
 
-            # KL divergence between real and distro with additional names
-            if divergence_type == "JS":
-                div_with_unstructured_by_round.append(JS(seen_distro_with_unstructured, true_distro_2))
-            else:
-                div_with_unstructured_by_round.append(KL(seen_distro_with_unstructured, true_distro_2))
 
-        # We'll select the non-neighbors with the most information (the smallest diff in KL) so
-        # we'll need to track the smallest divergences
-        smallest_divergence = None
+def session_gain_surface(arguments):
+    """ Worker process entry point: the gain surface of one session."""
 
-        # We get all the non-neighbors of the ego node
-        non_neighbors = net.get_non_alters(participant)
+    participant_data, group_round_names, session_key, settings = arguments
+    true_distro_by_round = impose_limited_memory(group_round_names, settings["memory_length"])
+    return simulate_gain_surface(participant_data, true_distro_by_round,
+                                 session_key=session_key,
+                                 return_iterations=True,
+                                 **settings)
 
-        # We get all possible combinations of non-neighbors
-        non_neighbor_combinations = combinations(non_neighbors,additional_names_count)
 
+def gain_surfaces(sessions,
+                  memory_length=8,
+                  divergence_type="KL",
+                  number_iterations=200,
+                  with_replacement=False,
+                  exact=False,
+                  max_compositions=1000,
+                  target_sem=None,
+                  block_size=50,
+                  max_iterations=5000,
+                  seed=None,
+                  cache=None,
+                  processes=None,
+                  return_iterations=False):
+    """
+    The simulate_gain_surface of every (loaded) session, keyed by session.run_key.
+    cache is a SurfaceCache, by default in GAIN_CACHE_DIRECTORY; pass False to
+    always simulate. Entries are kept by the run, its data and the settings, so
+    relabeling a run in the catalog still finds its surface.
+    """
+    if cache is None:
+        cache = SurfaceCache()
+
+    settings = {"memory_length": memory_length,
+                "divergence_type": divergence_type,
+                "number_iterations": number_iterations,
+                "with_replacement": with_replacement,
+                "exact": exact,
+                "max_compositions": max_compositions,
+                "target_sem": target_sem,
+                "block_size": block_size,
+                "max_iterations": max_iterations,
+                "seed": seed}
+
+    results = {}
+    to_simulate = []
+    for session in sessions:
+        key = (session.run_key,
+               session_fingerprint(session.participant_data, session.group_round_names),
+               tuple(sorted(settings.items())))
+        cached = cache.get(key) if cache else None
+        if cached is not None:
+            results[session.run_key] = cached
+        else:
+            to_simulate.append((session, key))
 
-        for combo in non_neighbor_combinations:
+    if to_simulate:
+        jobs = [(session.participant_data, session.group_round_names, session.run_key, settings)
+                for session, _ in to_simulate]
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            for (session, key), (surface, iterations) in zip(to_simulate,
+                                                             executor.map(session_gain_surface, jobs)):
+                participants = list(session.participant_data)
+                if cache:
+                    cache.put(key, surface, iterations, participants)
+                results[session.run_key] = (surface, iterations, participants)
 
-            names_to_add_by_round = defaultdict(list)
-            for not_neighbor in combo:
-                # We get the names played by the participant and append it to lists of names for
-                # each round
-                for round, name in enumerate(participant_data[not_neighbor]["names_played"]):
-                     names_to_add_by_round[round].append(name)
+    if return_iterations:
+        return {key: (surface, iterations) for key, (surface, iterations, _) in results.items()}
+    return {key: surface for key, (surface, _, _) in results.items()}
 
-            # We go through round by round and add in the newly visible names
-            simulated_distro_by_round = {}
 
-            # now we add to distribution with out unstructured
-            for game_round in range(1,26):
-                no_unstructured = list(data["distro_by_round_no_unstructured"][game_round])
-                no_unstructured.extend(names_to_add_by_round[game_round])
+"""
+All four comparators below measure the participant's real seen names against the
+true distribution, with and without the unstructured names, before doing anything
+of their own. Divergence_difference_graph runs all four on the same session, so
+the baselines are kept in a cache keyed by
+(session, participant, memory_length, divergence_type, smoothing) and computed once.
+
+The session part of the key can be anything hashable that identifies the data
+(the corpus uses Session.run_key). If it isn't given, the comparators fingerprint the
+participant data and true distributions so different data never share entries.
+Nothing is ever evicted on its own; call invalidate() with a session key once a
+session is done, or with no arguments to empty the whole cache.
+"""
+class BaselineCache():
 
-                simulated_distro_by_round[game_round] = no_unstructured
+    def __init__(self):
 
-            # That new list of names needs to be truncated to induce some memory
-            distro_by_round_with_non_neighbors = impose_limited_memory(simulated_distro_by_round,
-                                                                    memory_length=memory_length)
+        self.baselines = {}
 
-            divergence_by_round = []
-            for game_round in range(1,26):
+    def __len__(self):
 
-                seen_distro_non_neighbors, true_distro = create_continuity_and_probabilities(
-                                                distro_by_round_with_non_neighbors[game_round],
-                                                true_distro_by_round[game_round])
+        return len(self.baselines)
 
-                # Then we calculate the divergence from distro with weakest link to true distro
-                if divergence_type == "JS":
-                    div_with_non_neighbors = JS(seen_distro_non_neighbors, true_distro)
-                else:
-                    div_with_non_neighbors = KL(seen_distro_non_neighbors, true_distro)
-                divergence_by_round.append(div_with_non_neighbors)
+    def get(self, key):
 
+        return self.baselines.get(key)
 
-            # the sum is the area under the curve, or the total divergences for the whole run.
-            total_diff_in_divergences = sum(divergence_by_round)
+    def put(self, key, divergences):
 
-            if smallest_divergence != None:
-                if total_diff_in_divergences < sum(smallest_divergence):
-                    smallest_divergence = divergence_by_round
-                    alters_with_smallest_divergence = combo
-            else:
-                smallest_divergence = divergence_by_round
-                alters_with_smallest_divergence = combo
+        self.baselines[key] = divergences
 
-        # now that we have the smallest divergence to the true distro from simulated weakest
-        # link distro, we compare it to the divergence to the true distro from the real additional
-        # name distro. A positive difference as calculated means the additiona name version carries # more information (because it is closer to the true)
+    def invalidate(self, session_key=None):
 
-        game_diffs = [i-j for i, j in zip(smallest_divergence,div_with_unstructured_by_round)]
+        if session_key is None:
+            self.baselines.clear()
+        else:
+            for key in [key for key in self.baselines if key[0] == session_key]:
+                del self.baselines[key]
 
-        divergence_ratio = [1 - actual/total if total !=0 else 0 for actual, total in zip(div_with_unstructured_by_round, div_no_unstructured_by_round)]
 
-        #print("comparison:", divergence_by_round)
-        #print("base_diff:", div_no_unstructured_by_round)
-        #print("ratio:", divergence_ratio)
+baseline_cache = BaselineCache()
 
-        participant_differences[participant] = (game_diffs, alters_with_smallest_divergence, div_no_unstructured_by_round, divergence_ratio)
 
-    return participant_differences
+def session_fingerprint(participant_data, true_distro_by_round):
 
+    # repr of the nested dicts is stable for the same data read the same way
+    digest = hashlib.sha1(repr(sorted(participant_data.items())).encode("utf-8"))
+    digest.update(repr(sorted(true_distro_by_round.items())).encode("utf-8"))
 
+    return digest.hexdigest()
 
 
-def find_random_others(participant_data,
-                        true_distro_by_round,
-                        network_topology_name,
-                        additional_names_count,
-                        only_non_neighbors=False,
-                        divergence_type="JS",
-                        memory_length=5,
-                        graph=False):
-    """
-    The basic baseline is a random sample of additional neighbors to see. We randomly select a combination of neighbors and calculate the difference in divergences.
-    """
+def baseline_divergences(participant,
+                         data,
+                         true_distro_by_round,
+                         divergence_type="JS",
+                         memory_length=5,
+                         smoothing=.001,
+                         session_key=None,
+                         cache=None):
 
-    participant_differences = {}
+    if cache is None:
+        cache = baseline_cache
 
-    net = nb.net(network_topology_name)
+    key = (session_key, participant, memory_length, divergence_type, smoothing)
+    divergences = cache.get(key) if session_key is not None else None
 
-    # We start by going through each participant
-    for participant, data in participant_data.items():
-        # First we look at the overall divergence without unstructured names
-        div_no_unstructured_by_round = []
-
-        distro_by_round_no_unstructured = impose_limited_memory(data["distro_by_round_no_unstructured"],
-                                                        memory_length=memory_length)
-        for game_round in range(1,26):
+    if divergences is None:
+        divergences = []
+        for distro_name in ("distro_by_round_no_unstructured", "distro_by_round_unstructured"):
+            distro_by_round = impose_limited_memory(data[distro_name], memory_length=memory_length)
+            by_round = []
+            for game_round in range(1,26):
+                # a new list of names needs to be truncated to induce some memory
+                seen_distro, true_distro = create_continuity_and_probabilities(
+                                                        distro_by_round[game_round],
+                                                        true_distro_by_round[game_round],
+                                                        smoothing=smoothing)
+                by_round.append(divergence(seen_distro, true_distro, divergence_type))
+            divergences.append(tuple(by_round))
 
-            # a new list of names needs to be truncated to induce some memory
-            seen_distro_with_no_unstructured, true_distro = create_continuity_and_probabilities(
-                                                        distro_by_round_no_unstructured[game_round],
-                                                        true_distro_by_round[game_round])
+        divergences = tuple(divergences)
+        if session_key is not None:
+            cache.put(key, divergences)
 
-            # divergence between real and distro with no additional names
-            if divergence_type == "JS":
-                div_no_unstructured_by_round.append(JS(seen_distro_with_no_unstructured, true_distro))
-            else:
-                div_no_unstructured_by_round.append(KL(seen_distro_with_no_unstructured, true_distro))
+    # the comparators hand these lists back to the caller, so they get copies
+    return list(divergences[0]), list(divergences[1])
 
 
-        # Then we calculate the KL divergence for the real rounds with unstructured
-        div_with_unstructured_by_round = []
+"""
+The comparators all ask the same question: how far from the true distribution
+would the participant's seen names have been if, instead of the unstructured
+names, they had seen the names played by some other participants? They only
+differ in who those others are. A strategy answers that part; given a
+ComparisonContext and a participant, it returns a list of candidates, each a
+(visible, alters) pair where visible has one collection of alters per round
+(visible[0] is round 1) whose names that round become visible, and alters is
+what gets reported back. When a strategy returns several candidates, the one
+with the smallest total divergence over the run is kept (the first one on ties).
+
+compare_alters then builds the counterfactual distributions for every strategy
+and participant at once as count arrays, windows them with the prefix sums and
+evaluates all the divergences together, so adding a new baseline means writing
+a new strategy and registering it, not another copy of the divergence loop.
+For each strategy it returns the {participant: (game_diffs, alters,
+div_no_unstructured_by_round, divergence_ratio)} dictionary the comparators
+always have.
+
+The results are not quite those of the original one-loop-per-comparator code,
+which had two bugs. For a fixed set of alters (most_info, random_others and
+weakest_ties) the names were indexed with enumerate() from 0, so round r got
+the names the alters played in round r + 1, and round 25 got none. And when
+spare_alter had to borrow an alter's alters, the round partner was meant to be
+taken out of them, but the name used was undefined and a bare except hid the
+NameError, so the partner stayed in. Here round r gets the names of round r
+and the partner is left out. legacy=True brings both bugs back
+(LEGACY_ROUND_OFFSETS and ComparisonContext.legacy). It exists only to check
+this code against results computed before the fix.
+"""
+class ComparisonContext():
+
+    def __init__(self,
+                 participant_data,
+                 network_topology_name,
+                 additional_names_count,
+                 only_non_neighbors=False,
+                 true_distro_by_round=None,
+                 divergence_type="JS",
+                 memory_length=5,
+                 smoothing=.001,
+                 seed=None,
+                 session_key=None,
+                 legacy=False):
+
+        self.participant_data = participant_data
+        self.network_topology_name = network_topology_name
+        self.additional_names_count = additional_names_count
+        self.only_non_neighbors = only_non_neighbors
+        self.true_distro_by_round = true_distro_by_round
+        self.divergence_type = divergence_type
+        self.memory_length = memory_length
+        self.smoothing = smoothing
+        self.seed = seed
+        self.session_key = session_key
+        self.legacy = legacy
+        # which round's names the alters contribute, relative to the current one
+        # (compare_alters sets it for each strategy, see LEGACY_ROUND_OFFSETS)
+        self.round_offset = 0
+        self._net = None
+        self._weakest_links = None
+        self._arrays = None
+
+    @property
+    def net(self):
+
+        # the network is read from file once and shared by all the strategies
+        if self._net is None:
+            self._net = nb.net(self.network_topology_name)
+        return self._net
+
+    @property
+    def weakest_links(self):
+
+        if self._weakest_links is None:
+            self._weakest_links = self.net.calc_weakest_ties(self.additional_names_count,
+                                                             rng=self.random_stream(None, None, "weakest_ties"))
+        return self._weakest_links
+
+    def random_stream(self, participant, game_round, scenario):
+        """ The strategies' random draws, see random_stream."""
+        return random_stream(self.seed, self.session_key, participant, game_round, scenario)
+
+    @property
+    def arrays(self):
+
+        if self._arrays is None:
+            self._arrays = SessionCounts(self.participant_data, self.true_distro_by_round)
+        return self._arrays
+
+
+class SessionCounts():
+    """
+    The session's names as count arrays over one vocabulary: the names each
+    participant played (participants x 25 ids), each participant's seen names
+    without the unstructured ones (participants x 25 x vocabulary, not windowed)
+    and the true distribution (25 x vocabulary, already windowed).
+    """
+    def __init__(self, participant_data, true_distro_by_round):
 
-        distro_by_round_unstructured = impose_limited_memory(data["distro_by_round_unstructured"],
-                                                                memory_length=memory_length)
+        vocabulary = {}
         for game_round in range(1,26):
+            for name in true_distro_by_round[game_round]:
+                vocabulary.setdefault(name, len(vocabulary))
+        for data in participant_data.values():
+            for name in data["names_played"]:
+                vocabulary.setdefault(name, len(vocabulary))
+            for game_round in range(1,26):
+                for name in data["distro_by_round_no_unstructured"][game_round]:
+                    vocabulary.setdefault(name, len(vocabulary))
 
-            # a new list of names needs to be truncated to induce some memory
-            seen_distro_with_unstructured, true_distro_2 = create_continuity_and_probabilities(
-                                                            distro_by_round_unstructured[game_round],
-                                                            true_distro_by_round[game_round])
+        self.vocabulary = vocabulary
+        self.rows = {participant: row for row, participant in enumerate(participant_data)}
+        self.played = np.array([[vocabulary[name] for name in data["names_played"]]
+                                for data in participant_data.values()])
 
-            # KL divergence between real and distro with additional name
-            if divergence_type == "JS":
-                div_with_unstructured_by_round.append(JS(seen_distro_with_unstructured, true_distro_2))
-            else:
-                div_with_unstructured_by_round.append(KL(seen_distro_with_unstructured, true_distro_2))
+        self.base_counts = np.zeros((len(self.rows), 25, len(vocabulary)), dtype=np.int64)
+        for row, data in enumerate(participant_data.values()):
+            for game_round in range(1,26):
+                for name in data["distro_by_round_no_unstructured"][game_round]:
+                    self.base_counts[row, game_round-1, vocabulary[name]] += 1
 
+        self.true_counts = np.zeros((25, len(vocabulary)), dtype=np.int64)
+        for game_round in range(1,26):
+            for name, count in true_distro_by_round[game_round].items():
+                self.true_counts[game_round-1, vocabulary[name]] = count
 
+    def played_ids(self, round_offset=0):
+        """ played, from round_offset rounds later (-1, no name, past round 25)."""
+        if round_offset == 0:
+            return self.played
+        padding = np.full((len(self.played), round_offset), -1)
+        return np.concatenate([self.played[:, round_offset:], padding], axis=1)
 
-        if only_non_neighbors == True:
-            # We get all the non-neighbors of the ego node
-            random_others = list(net.get_non_alters(participant))
-        else:
-            random_others = list(net.network.nodes())
-            random_others.remove(participant)
+    def played_counts(self, participants, round_offset=0):
+        """ (participants x 25 x vocabulary) one-hot counts of the names they played."""
+        ids = self.played_ids(round_offset)[[self.rows[participant] for participant in participants]]
+        return round_counts(ids[..., None], len(self.vocabulary))
 
-        # We randomly select a combination of non-neighbors
-        random_others_combination = random.sample(random_others, additional_names_count)
 
-        names_to_add_by_round = defaultdict(list)
-        for random_other in random_others_combination:
-            # We get the names played by the participant and append it to lists of names for
-            # each round
-            for round, name in enumerate(participant_data[random_other]["names_played"]):
-                 names_to_add_by_round[round].append(name)
+def weakest_ties_strategy(context, participant):
+    """
+    The "weakest links", i.e. structurally distant ties, for each node given the
+    network topology. There can be multiple such links so net samples the
+    required number.
+    """
+    alters = context.weakest_links[participant]
+    return [([alters]*25, alters)]
 
-        # We go through round by round and add in the newly visible names
-        simulated_distro_by_round = {}
 
-        # now we add to distribution with out unstructured
-        for game_round in range(1,26):
-            no_unstructured = list(data["distro_by_round_no_unstructured"][game_round])
-            no_unstructured.extend(names_to_add_by_round[game_round])
+def most_info_strategy(context, participant):
+    """
+    The combination of non-neighbors with the most information relative to the
+    ego (the smallest total divergence). When the additional names are more than
+    one, the information comes from the joint distribution of both (or all three)
+    additional names, which is why it's combinations. The search is done by
+    most_informative_alters.
+    """
+    non_neighbors = context.net.get_non_alters(participant)
+    combo, _ = most_informative_alters(context, participant, non_neighbors)
+    return [([combo]*25, combo)]
 
-            simulated_distro_by_round[game_round] = no_unstructured
 
-        # That new list of names needs to be truncated to induce some memory
-        distro_by_round_with_random_others = impose_limited_memory(simulated_distro_by_round,
-                                                                memory_length=memory_length)
+def random_others_strategy(context, participant):
+    """ A random sample of other participants, fixed for the whole run."""
+    if context.only_non_neighbors == True:
+        random_others = list(context.net.get_non_alters(participant))
+    else:
+        random_others = list(context.net.network.nodes())
+        random_others.remove(participant)
 
-        divergence_by_round = []
-        for game_round in range(1,26):
+    rng = context.random_stream(participant, None, "random_others")
+    random_others_combination = rng.sample(random_others, context.additional_names_count)
+    return [([random_others_combination]*25, random_others_combination)]
 
-            seen_distro_random_others, true_distro = create_continuity_and_probabilities(
-                                            distro_by_round_with_random_others[game_round],
-                                            true_distro_by_round[game_round])
 
-            # Then we calculate the divergence from distro with the additional names to true distro
-            if divergence_type == "JS":
-                div_with_random_others = JS(seen_distro_random_others, true_distro)
-            else:
-                div_with_random_others = KL(seen_distro_random_others, true_distro)
-            divergence_by_round.append(div_with_random_others)
+def spare_alter_strategy(context, participant):
+    """
+    Each round, random network alters other than the one the participant actually
+    played against. This is complicated in the case of the small world networks,
+    which don't have a constant degree distribution. If there aren't enough alters
+    for the required number of exposures, we get more from an alter's alter.
+    """
+    net = context.net
+    additional_names_count = context.additional_names_count
+
+    # here we get the fixed list of the participant's network alters
+    alters = list(net.network.neighbors(participant))
+
+    visible = []
+    for game_round, round_partner in context.participant_data[participant]["actual_alters"].items():
+        new_alters = list(alters)
+        new_alters.remove(round_partner)
+        if len(new_alters) >= additional_names_count:
+            rng = context.random_stream(participant, game_round, "spare_alter")
+            list_of_random_alters = rng.sample(new_alters, additional_names_count)
+        else:
+            more_needed = additional_names_count - len(new_alters)
+            next_alter = 0
+            alters_to_add = new_alters
+            while more_needed > 0:
+                alters_alters = list(net.network.neighbors(new_alters[next_alter]))
+                # (the original code never managed to remove the partner, see compare_alters)
+                if round_partner in alters_alters and not context.legacy:
+                    alters_alters.remove(round_partner)
+                if participant in alters_alters:
+                    alters_alters.remove(participant)
+                alters_to_add.extend(alters_alters)
+                next_alter +=1
+                more_needed -= len(alters_to_add)
+            # It's possible that we now have too many names, so we truncate the list
+            list_of_random_alters = alters_to_add[:additional_names_count]
+            assert len(list_of_random_alters) == additional_names_count, (list_of_random_alters, additional_names_count)
+        visible.append(list_of_random_alters)
+
+    # the alters reported are the ones from the last round
+    return [(visible, list_of_random_alters)]
+
+
+COMPARATOR_STRATEGIES = {}
+
+def register_comparator(name, strategy):
+
+    COMPARATOR_STRATEGIES[name] = strategy
+
+
+register_comparator("most_info", most_info_strategy)
+register_comparator("random_others", random_others_strategy)
+register_comparator("weakest_ties", weakest_ties_strategy)
+register_comparator("spare_alter", spare_alter_strategy)
+
+# the round offsets of the original comparators, for compare_alters(legacy=True)
+LEGACY_ROUND_OFFSETS = {"most_info": 1, "random_others": 1, "weakest_ties": 1}
+
+
+def compare_alters(participant_data,
+                   true_distro_by_round,
+                   network_topology_name,
+                   additional_names_count,
+                   strategies=("most_info", "random_others", "weakest_ties", "spare_alter"),
+                   only_non_neighbors=False,
+                   divergence_type="JS",
+                   memory_length=5,
+                   smoothing=.001,
+                   session_key=None,
+                   chunk_size=None,
+                   seed=None,
+                   legacy=False):
+
+    if session_key is None:
+        session_key = session_fingerprint(participant_data, true_distro_by_round)
+
+    context = ComparisonContext(participant_data, network_topology_name,
+                                additional_names_count, only_non_neighbors=only_non_neighbors,
+                                true_distro_by_round=true_distro_by_round,
+                                divergence_type=divergence_type,
+                                memory_length=memory_length,
+                                smoothing=smoothing,
+                                seed=seed,
+                                session_key=session_key,
+                                legacy=legacy)
+
+    # strategies can be registered names or the functions themselves
+    strategies = [(strategy, COMPARATOR_STRATEGIES[strategy]) if isinstance(strategy, str)
+                  else (strategy.__name__, strategy) for strategy in strategies]
+
+    # The strategies run one after the other, so without a seed the random draws happen
+    # in the same order as calling the comparators one at a time
+    candidates = []
+    round_offsets = []
+    for strategy_name, strategy in strategies:
+        context.round_offset = LEGACY_ROUND_OFFSETS.get(strategy_name, 0) if legacy else 0
+        for participant in participant_data:
+            for visible, alters in strategy(context, participant):
+                candidates.append((strategy_name, participant, visible, alters))
+                round_offsets.append(context.round_offset)
+    context.round_offset = 0
+
+    divergences = counterfactual_divergences(context,
+                                             [(participant, visible) for _, participant, visible, _ in candidates],
+                                             chunk_size=chunk_size,
+                                             round_offsets=round_offsets)
+
+    # the run totals are summed round by round, like sum() on the list
+    totals = np.cumsum(divergences, axis=1)[:, -1]
+
+    best = {}
+    for index, (strategy_name, participant, _, _) in enumerate(candidates):
+        key = (strategy_name, participant)
+        if key not in best or totals[index] < totals[best[key]]:
+            best[key] = index
+
+    results = {}
+    for strategy_name, _ in strategies:
+        participant_differences = {}
+        for participant in participant_data:
+            index = best[(strategy_name, participant)]
 
-        # now that we have the divergence to the true distro from simulated distro, we compare it
-        # to the divergence to the true distro from the real additional name distro. A positive
-        # difference as calculated means the additional name version carries more information
-        # (because it is closer to the true)
+            div_no_unstructured_by_round, div_with_unstructured_by_round = baseline_divergences(
+                                                        participant, participant_data[participant],
+                                                        true_distro_by_round,
+                                                        divergence_type=divergence_type,
+                                                        memory_length=memory_length,
+                                                        smoothing=smoothing,
+                                                        session_key=session_key)
 
-        game_diffs = [i-j for i, j in zip(divergence_by_round,div_with_unstructured_by_round)]
+            # A positive difference means the real additional names carry more information
+            # (because they are closer to the true)
+            game_diffs = [float(i)-j for i, j in zip(divergences[index], div_with_unstructured_by_round)]
 
-        divergence_ratio = [1 - actual/total if total !=0 else 0 for actual, total in zip(div_with_unstructured_by_round, div_no_unstructured_by_round)]
+            divergence_ratio = [1 - actual/total if total !=0 else 0 for actual, total in zip(div_with_unstructured_by_round, div_no_unstructured_by_round)]
 
-        #print("comparison:", divergence_by_round)
-        #print("base_diff:", div_no_unstructured_by_round)
-        #print("ratio:", divergence_ratio)
+            participant_differences[participant] = (game_diffs,
+                                                    candidates[index][3],
+                                                    div_no_unstructured_by_round,
+                                                    divergence_ratio)
+        results[strategy_name] = participant_differences
 
-        participant_differences[participant] = (game_diffs, random_others_combination, div_no_unstructured_by_round, divergence_ratio)
+    return results
 
-    return participant_differences
 
-def find_spare_alter(participant_data,
-                            true_distro_by_round,
-                            network_topology_name,
-                            additional_names_count,
-                            only_non_neighbors=False,
-                            divergence_type="JS",
-                            memory_length=5,
-                            graph=False):
-        """
-        For this comparison, the participant is 'exposed' to a name played by a random alter the participant is not currently playing with.
-        """
+def counterfactual_divergences(context, candidates, chunk_size=None, round_offsets=None):
+    """
+    The (candidates x 25) divergences to the true distribution of each participant's
+    seen names without the unstructured ones, plus the names the candidate's alters
+    played that round (round_offsets rounds later, one per candidate, for
+    compare_alters(legacy=True)). candidates is a list of (participant, visible) pairs.
+    """
+    arrays = context.arrays
+    vocabulary_size = len(arrays.vocabulary)
+
+    if round_offsets is None:
+        round_offsets = [0]*len(candidates)
+    round_offsets = np.asarray(round_offsets, dtype=np.int64)
+    # a last column of no names for the rounds past 25
+    played = np.concatenate([arrays.played, np.full((len(arrays.played), 1), -1)], axis=1)
+
+    if chunk_size is None:
+        # keeps each chunk's count arrays to a few tens of megabytes
+        chunk_size = max(1, 2**19 // (25*vocabulary_size))
+
+    divergences = np.zeros((len(candidates), 25))
+    for start in range(0, len(candidates), chunk_size):
+        chunk = candidates[start:start + chunk_size]
+        width = max([len(round_alters) for _, visible in chunk for round_alters in visible] + [1])
+
+        owners = np.array([arrays.rows[participant] for participant, _ in chunk])
+        alters = np.full((len(chunk), 25, width), -1)
+        for position, (_, visible) in enumerate(chunk):
+            for game_round, round_alters in enumerate(visible):
+                alters[position, game_round, :len(round_alters)] = [arrays.rows[alter] for alter in round_alters]
+
+        played_rounds = np.minimum(np.arange(25)[None, :, None] + round_offsets[start:start + len(chunk), None, None], 25)
+        added_ids = np.where(alters >= 0, played[alters, played_rounds], -1)
+        counts = arrays.base_counts[owners] + round_counts(added_ids, vocabulary_size)
+
+        seen_counts = window_differences(prefix_counts(counts), context.memory_length)
+        divergences[start:start + len(chunk)] = aligned_divergences(
+                                                    seen_counts,
+                                                    np.broadcast_to(arrays.true_counts, seen_counts.shape),
+                                                    divergence_type=context.divergence_type,
+                                                    smoothing=context.smoothing)
+    return divergences
 
-        participant_differences = {}
 
-        net = nb.net(network_topology_name)
+"""
+Looking for the most informative non-neighbors used to mean rebuilding and
+re-windowing the seen names for every combination. The windows are linear in
+the counts, so each non-neighbor's windowed contribution is computed once and
+a combination's seen counts are the participant's own windows plus the sum of
+its members' contributions.
+
+Combinations are then scored a block of rounds at a time, starting with the
+rounds where the divergences are largest. A combination is dropped as soon as
+its divergence so far, plus the least the remaining rounds could add, is more
+than the best complete total found. Where that least is
+comes from the log sum inequality: the smoothing leaves one of the two
+distributions summing to a = 1 - (missing names) x smoothing, which bounds each
+round's KL from below by a log a, and JS terms are never negative. The best
+combination of the single most informative non-neighbors gives a starting total.
+
+The search returns the same combination as scoring every one of them (the first
+one in combinations() order on ties) and its per round divergences.
+"""
+def most_informative_alters(context,
+                            participant,
+                            alters,
+                            block_rounds=2,
+                            chunk_size=None):
 
-        # We start by going through each participant
-        for participant, data in participant_data.items():
-            # First we look at the overall divergence without unstructured names
-            div_no_unstructured_by_round = []
+    top, _ = search_combinations(context, participant, alters,
+                                 block_rounds=block_rounds, chunk_size=chunk_size)
+    combo, _, curve = top[0]
+    return combo, curve
 
-            distro_by_round_no_unstructured = impose_limited_memory(data["distro_by_round_no_unstructured"],
-                                                            memory_length=memory_length)
-            for game_round in range(1,26):
 
-                # a new list of names needs to be truncated to induce some memory
-                seen_distro_with_no_unstructured, true_distro = create_continuity_and_probabilities(
-                                                            distro_by_round_no_unstructured[game_round], true_distro_by_round[game_round])
+"""
+The same search can keep more than the single best combination. With top_k,
+every scored combination goes through a bounded heap and the top_k best come
+back best first, as (combo, total, per round divergences), ties in
+combinations() order. Pruning is then against the k-th best total.
+
+With summary=True nothing is pruned, since the statistics cover every
+combination, and a dictionary with the count, mean, standard deviation,
+min, max and the requested quantiles of the run totals comes back too
+(otherwise None). It's still one pass over the combinations.
+"""
+def search_combinations(context,
+                        participant,
+                        alters,
+                        top_k=1,
+                        summary=False,
+                        quantiles=(.05, .25, .5, .75, .95),
+                        block_rounds=2,
+                        chunk_size=None):
+
+    arrays = context.arrays
+    additional_names_count = context.additional_names_count
+    memory_length = context.memory_length
+    alters = list(alters)
+    if len(alters) < additional_names_count:
+        raise ValueError("Participant {} has {} candidates for {} additional names".format(
+                          participant, len(alters), additional_names_count))
+
+    vocabulary_size = len(arrays.vocabulary)
+    own_windows = window_differences(prefix_counts(arrays.base_counts[arrays.rows[participant]]),
+                                     memory_length)
+    contributions = window_differences(prefix_counts(arrays.played_counts(alters, context.round_offset)),
+                                       memory_length)
+    true_counts = arrays.true_counts
+
+    def score(combos, rounds):
+        counts = own_windows[rounds] + contributions[:, rounds][combos].sum(axis=1)
+        return aligned_divergences(counts, np.broadcast_to(true_counts[rounds], counts.shape),
+                                   divergence_type=context.divergence_type,
+                                   smoothing=context.smoothing)
+
+    # the least any round can contribute
+    floor = get_divergence(context.divergence_type).floor(1 - vocabulary_size*context.smoothing)
+
+    # starting total from the best singles taken together
+    singles = score(np.arange(len(alters))[:, None], slice(0, 25))
+    greedy = np.sort(np.argsort(np.cumsum(singles, axis=1)[:, -1], kind="stable")[:additional_names_count])
+    greedy_curve = score(greedy[None, :], slice(0, 25))[0]
+    threshold = np.cumsum(greedy_curve)[-1] if top_k == 1 else math.inf
+
+    # the largest rounds of the starting combination go first, so the totals
+    # climb past the best ones as early as possible
+    round_order = np.argsort(-greedy_curve, kind="stable")
+    blocks = [round_order[start:start + block_rounds] for start in range(0, 25, block_rounds)]
+    remaining_floor = [floor*(25 - min(start + block_rounds, 25)) for start in range(0, 25, block_rounds)]
+
+    if chunk_size is None:
+        chunk_size = max(1, 2**19 // (block_rounds*vocabulary_size*additional_names_count))
+
+    # the heap's root is the worst kept, so entries are (-total, -index)
+    heap = []
+    all_totals = []
+    position = 0
+    all_combos = combinations(range(len(alters)), additional_names_count)
+    while True:
+        combos = np.array(list(islice(all_combos, chunk_size)), dtype=np.int64)
+        if not len(combos):
+            break
+
+        curves = np.zeros((len(combos), 25))
+        partial = np.zeros(len(combos))
+        alive = np.arange(len(combos))
+        for block, floor_left in zip(blocks, remaining_floor):
+            block_divergences = score(combos[alive], block)
+            curves[alive[:, None], block] = block_divergences
+            if summary:
+                continue
+            partial[alive] += block_divergences.sum(axis=1)
+            # pruning leaves room for rounding so ties with the kept ones are never dropped
+            alive = alive[partial[alive] + floor_left <= threshold + 1e-9*(1 + abs(threshold))]
+            if not len(alive):
+                break
+
+        # run totals summed round by round, as in compare_alters
+        totals = np.cumsum(curves[alive], axis=1)[:, -1]
+        if summary:
+            all_totals.append(totals)
+
+        for total, row in zip(totals.tolist(), alive.tolist()):
+            entry = (-total, -(position + row))
+            if len(heap) < top_k:
+                heapq.heappush(heap, entry + (tuple(alters[i] for i in combos[row]), curves[row]))
+            elif entry > heap[0][:2]:
+                heapq.heapreplace(heap, entry + (tuple(alters[i] for i in combos[row]), curves[row]))
+            else:
+                continue
+            if len(heap) == top_k:
+                threshold = min(threshold, -heap[0][0])
+        position += len(combos)
 
-                # divergence between real and distro with no additional names
-                if divergence_type == "JS":
-                    div_no_unstructured_by_round.append(JS(seen_distro_with_no_unstructured, true_distro))
-                else:
-                    div_no_unstructured_by_round.append(KL(seen_distro_with_no_unstructured, true_distro))
+    top = [(combo, -negative_total, [float(value) for value in curve])
+           for negative_total, _, combo, curve in sorted(heap, reverse=True)]
 
+    statistics = None
+    if summary:
+        all_totals = np.concatenate(all_totals)
+        statistics = {"count": len(all_totals),
+                      "mean": float(all_totals.mean()),
+                      "std": float(all_totals.std()),
+                      "min": float(all_totals.min()),
+                      "max": float(all_totals.max()),
+                      "quantiles": {q: float(value) for q, value in
+                                    zip(quantiles, np.quantile(all_totals, quantiles))}}
 
-            # Then we calculate the KL divergence for the real rounds with unstructured
-            div_with_unstructured_by_round = []
+    return top, statistics
 
-            distro_by_round_unstructured = impose_limited_memory(data["distro_by_round_unstructured"],
-                                                                    memory_length = memory_length)
 
-            for game_round in range(1,26):
+def aligned_divergences(seen_counts, true_counts, divergence_type="JS", smoothing=.001):
+    """
+    Divergences of stacked count rows, the way the dictionary path computes them:
+    create_continuity_and_probabilities hands back the distribution with fewer types
+    first, so in the rounds where the seen names have more types than the true ones,
+    the divergence is taken with the two swapped.
+    """
+    kernel = get_divergence(divergence_type).kernel
 
-                # a new list of names needs to be truncated to induce some memory
-                seen_distro_with_unstructured, true_distro_2 = create_continuity_and_probabilities(
-                                                            distro_by_round_unstructured[game_round],
-                                                            true_distro_by_round[game_round])
-
-                # KL divergence between real and distro with additional name
-                if divergence_type == "JS":
-                    div_with_unstructured_by_round.append(JS(seen_distro_with_unstructured, true_distro_2))
-                else:
-                    div_with_unstructured_by_round.append(KL(seen_distro_with_unstructured, true_distro_2))
-
-
-            net = nb.net(network_topology_name)
-
-            # here we get the fixed list of the participant's network alters
-            alters = list(net.network.neighbors(participant))
-
-            names_to_add_by_round = {}
-
-            for round, round_partner in data["actual_alters"].items():
-                # We randomly select additional alters until we have the right number that aren't the one the participant actually just played against. This is complicated in the case of the small world networks, which don't have a constant degree distribution. If there aren't enough alters for the required number of exposures, we get more from an alter's alter.
-                list_of_random_alters = []
-                new_alters = list(alters)
-                new_alters.remove(round_partner)
-                if len(new_alters) >= additional_names_count:
-                    list_of_random_alters = random.sample(new_alters, additional_names_count)
-                else:
-                    more_needed = additional_names_count - len(new_alters)
-                    next_alter = 0
-                    alters_to_add = new_alters
-                    while more_needed > 0:
-                        alters_alters = list(net.network.neighbors(new_alters[next_alter]))
-                        try:
-                            alters_alters.remove(round_alter)
-                        except:
-                            pass
-                        try:
-                            alters_alters.remove(participant)
-                        except:
-                            pass
-                        alters_to_add.extend(alters_alters)
-                        next_alter +=1
-                        more_needed -= len(alters_to_add)
-                    # It's possible that we now have too many names, so we truncate the list
-                    list_of_random_alters = alters_to_add[:additional_names_count]
-                    assert len(list_of_random_alters) == additional_names_count, (list_of_random_alters, additional_names_count)
-
-
-
-                # We get the name the random alter played and add it to the list
-                other_names = []
-                for other_alter in list_of_random_alters:
-                    other_names.append(participant_data[other_alter]["names_played"][round-1])
-                names_to_add_by_round[round] = other_names
-
-
-            # We go through round by round and add in the newly visible names
-            simulated_distro_by_round = {}
-
-            # now we add to distribution with out unstructured
-            for game_round in range(1,26):
-                no_unstructured = list(data["distro_by_round_no_unstructured"][game_round])
-                no_unstructured.extend(names_to_add_by_round[game_round])
+    seen, log_seen, true, log_true = aligned_log_probabilities(seen_counts, true_counts,
+                                                               smoothing=smoothing)
+    divergences = np.array(kernel(seen, log_seen, true, log_true), dtype=float)
 
-                simulated_distro_by_round[game_round] = no_unstructured
+    swapped = (np.count_nonzero(seen_counts, axis=-1) >
+               np.count_nonzero(true_counts, axis=-1))
+    if swapped.any():
+        divergences[swapped] = kernel(true[swapped], log_true[swapped],
+                                      seen[swapped], log_seen[swapped])
+    return divergences
 
-            # That new list of names needs to be truncated to induce some memory
-            distro_by_round_with_random_others = impose_limited_memory(simulated_distro_by_round,
-                                                                    memory_length=memory_length)
 
-            div_with_random_by_round = []
-            for game_round in range(1,26):
+def simulate_weakest_ties(participant_data,
+                            true_distro_by_round,
+                            network_topology_name,
+                            additional_name_count,
+                            divergence_type="JS",
+                            memory_length=5,
+                            graph=False,
+                            session_key=None,
+                            seed=None):
+    """
+    This method explores the informational value of signals from the "weakest links" and
+    compares that value to the value of the additional homogeneous mixing names. To do this,
+    we first get the "weakest", i.e. structurally distant, links for each node given the
+    network topology. There can be multiple such links so we just sample the required number.
+    """
+    return compare_alters(participant_data, true_distro_by_round, network_topology_name,
+                          additional_name_count, strategies=("weakest_ties",),
+                          divergence_type=divergence_type, memory_length=memory_length,
+                          session_key=session_key, seed=seed)["weakest_ties"]
 
-                seen_distro_random_others, true_distro = create_continuity_and_probabilities(
-                                                distro_by_round_with_random_others[game_round],
-                                                true_distro_by_round[game_round])
 
-                # Then we calculate the divergence from distro with the additional names to true distro
-                if divergence_type == "JS":
-                    div_with_random_others = JS(seen_distro_random_others, true_distro)
-                else:
-                    div_with_random_others = KL(seen_distro_random_others, true_distro)
-                div_with_random_by_round.append(div_with_random_others)
+def find_non_neighbors_with_most_info(participant_data,
+                                    true_distro_by_round,
+                                    network_topology_name,
+                                    additional_names_count,
+                                    divergence_type="JS",
+                                    memory_length=5,
+                                    graph=False,
+                                    session_key=None):
+    """
+    Rather than find the "weakest" ties like in simulate_weakest_ties, I just look at all
+    non-neighbors and the information they possess relative to the ego. The ones with the most information become the baseline.
 
-            # now that we have the divergence to the true distro from simulated distro, we compare it
-            # to the divergence to the true distro from the real additional name distro. A positive
-            # difference as calculated means the additional name version carries more information
-            # (because it is closer to the true)
+    When the additional names is more than one, the information yielded is calculated from the joint distribution of both (or all three) additional names. That means we need to look at all combos.
+    """
+    return compare_alters(participant_data, true_distro_by_round, network_topology_name,
+                          additional_names_count, strategies=("most_info",),
+                          divergence_type=divergence_type, memory_length=memory_length,
+                          session_key=session_key)["most_info"]
+
+
+def rank_non_neighbor_combinations(participant_data,
+                                   true_distro_by_round,
+                                   network_topology_name,
+                                   additional_names_count,
+                                   top_k=5,
+                                   summary=True,
+                                   divergence_type="JS",
+                                   memory_length=5):
+    """
+    Like find_non_neighbors_with_most_info, but rather than just the best combination of
+    non-neighbors, each participant gets the top_k of them with their divergence curves, and
+    (with summary) statistics of the run totals over all the combinations. Returns
+    {participant: (top, summary)}, see search_combinations.
+    """
+    context = ComparisonContext(participant_data, network_topology_name, additional_names_count,
+                                true_distro_by_round=true_distro_by_round,
+                                divergence_type=divergence_type,
+                                memory_length=memory_length)
 
-            game_diffs = [i-j for i, j in zip(div_with_random_by_round,div_with_unstructured_by_round)]
+    rankings = {}
+    for participant in participant_data:
+        rankings[participant] = search_combinations(context, participant,
+                                                    context.net.get_non_alters(participant),
+                                                    top_k=top_k, summary=summary)
+    return rankings
 
-            divergence_ratio = [1 - actual/total if total !=0 else 0 for actual, total in zip(div_with_unstructured_by_round, div_no_unstructured_by_round)]
 
-            #print("comparison:", div_with_random_by_round)
-            #print("base_diff:", div_no_unstructured_by_round)
-            #print("ratio:", divergence_ratio)
+def find_random_others(participant_data,
+                        true_distro_by_round,
+                        network_topology_name,
+                        additional_names_count,
+                        only_non_neighbors=False,
+                        divergence_type="JS",
+                        memory_length=5,
+                        graph=False,
+                        session_key=None,
+                        seed=None):
+    """
+    The basic baseline is a random sample of additional neighbors to see. We randomly select a combination of neighbors and calculate the difference in divergences.
+    """
+    return compare_alters(participant_data, true_distro_by_round, network_topology_name,
+                          additional_names_count, strategies=("random_others",),
+                          only_non_neighbors=only_non_neighbors,
+                          divergence_type=divergence_type, memory_length=memory_length,
+                          session_key=session_key, seed=seed)["random_others"]
 
-            participant_differences[participant] = (game_diffs, list_of_random_alters, div_no_unstructured_by_round, divergence_ratio)
 
-        return participant_differences
+def find_spare_alter(participant_data,
+                            true_distro_by_round,
+                            network_topology_name,
+                            additional_names_count,
+                            only_non_neighbors=False,
+                            divergence_type="JS",
+                            memory_length=5,
+                            graph=False,
+                            session_key=None,
+                            seed=None):
+    """
+    For this comparison, the participant is 'exposed' to a name played by a random alter the participant is not currently playing with.
+    """
+    return compare_alters(participant_data, true_distro_by_round, network_topology_name,
+                          additional_names_count, strategies=("spare_alter",),
+                          only_non_neighbors=only_non_neighbors,
+                          divergence_type=divergence_type, memory_length=memory_length,
+                          session_key=session_key, seed=seed)["spare_alter"]
@@ -44,7 +44,7 @@ class net():
 
         return self.alter_pairings_by_round
 
-    def select_weakest_tie(self, lengths):
+    def select_weakest_tie(self, lengths, rng=None):
 
         length_set = list(set(lengths.values()))
         length_set.sort(reverse=True)
@@ -52,11 +52,14 @@ class net():
         # get all alters with a shortest path equal to the maximum length
         max_alters = [int(alter) for alter, length in lengths.items() if length==length_set[0]]
 
-        return random.choice(max_alters)
+        # rng can be a random.Random for reproducible choices, otherwise the random module
+        if rng is None:
+            rng = random
+        return rng.choice(max_alters)
 
 
 
-    def calc_weakest_ties(self, additional_names_count):
+    def calc_weakest_ties(self, additional_names_count, rng=None):
         """
         To assess the value of additional names at random, I compare it to the value of the names from the "weakest" ties, that is a new link between the ego any of the nodes with the longest shortest pair to the ego. This link will be a bridging tie in the sense that it shortens distances, but it need not alter the centralities of the network much.
 
@@ -72,7 +75,7 @@ class net():
             source = values[0]
             paths_to_targets = values[1]
 
-            first_weakest = self.select_weakest_tie(paths_to_targets)
+            first_weakest = self.select_weakest_tie(paths_to_targets, rng=rng)
             this_nodes_weakest = [first_weakest]
 
             # now we do it again until we have enough names
@@ -84,14 +87,14 @@ class net():
 
                 # then we recalculate the paths
                 new_paths = nx.single_source_shortest_path_length(graph_copy, source)
-                second_weakest=self.select_weakest_tie(nx.single_source_shortest_path_length(graph_copy, source))
+                second_weakest=self.select_weakest_tie(nx.single_source_shortest_path_length(graph_copy, source), rng=rng)
                 this_nodes_weakest.append(second_weakest)
 
                 # One graph had three names, so we need to do it one more time
                 if additional_names_count > 2:
                     graph_copy.add_edge(source, second_weakest)
                     new_paths = nx.single_source_shortest_path_length(graph_copy, source)
-                    third_weakest=self.select_weakest_tie(nx.single_source_shortest_path_length(graph_copy, source))
+                    third_weakest=self.select_weakest_tie(nx.single_source_shortest_path_length(graph_copy, source), rng=rng)
                     this_nodes_weakest.append(third_weakest)
 
             weakest_ties[source] = this_nodes_weakest
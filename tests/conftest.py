@@ -0,0 +1,7 @@
+import os, sys
+
+# the modules are flat at the top of the repository, and several of them read
+# their data files (fields_to_keep_*.csv, Data-*.csv) relative to it
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY)
+os.chdir(REPOSITORY)
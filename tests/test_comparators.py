@@ -0,0 +1,119 @@
+from collections import defaultdict
+
+import networkx as nx
+import pytest
+
+import data_reader
+import information_calculations as ic
+
+
+SESSION_FILE = "Data-2addtl-RANDOMA.csv"
+MEMORY_LENGTH = 8
+
+
+@pytest.fixture(scope="module")
+def session():
+
+    participant_data, group_round_names = data_reader.preanalysis_packing(
+                                                data_reader.import_participants(SESSION_FILE))
+    true_distro_by_round = ic.impose_limited_memory(group_round_names, MEMORY_LENGTH)
+    return participant_data, true_distro_by_round
+
+
+@pytest.fixture
+def topology(session, tmp_path, monkeypatch):
+    """ A topology file of the run's actual pairings, where network_build looks for it."""
+
+    participant_data, _ = session
+    directory = tmp_path / "experiment_data" / "network_topologies"
+    directory.mkdir(parents=True)
+    with open(str(directory / SESSION_FILE), "w") as f:
+        for game_round in range(1,26):
+            pairs = sorted({tuple(sorted((participant, data["actual_alters"][game_round])))
+                            for participant, data in participant_data.items()})
+            f.write("round_number {}\n".format(game_round))
+            f.write(" ".join("({},{})".format(*pair) for pair in pairs) + "\n")
+
+    (tmp_path / "scripts").mkdir()
+    monkeypatch.chdir(str(tmp_path / "scripts"))
+    return SESSION_FILE
+
+
+def dictionary_game_diffs(participant_data, true_distro_by_round, participant, alters,
+                          divergence_type, round_offset):
+    """
+    The game differences of one participant and fixed alters, the way the original
+    comparators computed them: round r sees the names the alters played in round
+    r + round_offset.
+    """
+    data = participant_data[participant]
+
+    names_to_add_by_round = defaultdict(list)
+    for alter in alters:
+        for game_round, name in enumerate(participant_data[alter]["names_played"], start=1 - round_offset):
+            names_to_add_by_round[game_round].append(name)
+
+    simulated = {game_round: list(data["distro_by_round_no_unstructured"][game_round]) +
+                             names_to_add_by_round[game_round] for game_round in range(1,26)}
+
+    game_diffs = []
+    for distro_name, distro_by_round in (("simulated", simulated),
+                                         ("unstructured", data["distro_by_round_unstructured"])):
+        windowed = ic.impose_limited_memory(distro_by_round, memory_length=MEMORY_LENGTH)
+        game_diffs.append([getattr(ic, divergence_type)(*ic.create_continuity_and_probabilities(
+                               windowed[game_round], true_distro_by_round[game_round]))
+                           for game_round in range(1,26)])
+    return [simulated - actual for simulated, actual in zip(*game_diffs)]
+
+
+@pytest.mark.parametrize("divergence_type", ["KL", "JS"])
+@pytest.mark.parametrize("legacy", [False, True])
+def test_fixed_alters_see_the_names_of_their_round(session, topology, divergence_type, legacy):
+
+    participant_data, true_distro_by_round = session
+    strategies = ("weakest_ties", "random_others")
+    results = ic.compare_alters(participant_data, true_distro_by_round, topology, 2,
+                                strategies=strategies, divergence_type=divergence_type,
+                                memory_length=MEMORY_LENGTH, seed=3, legacy=legacy)
+
+    round_offset = 1 if legacy else 0
+    for strategy in strategies:
+        for participant, (game_diffs, alters, _, _) in results[strategy].items():
+            expected = dictionary_game_diffs(participant_data, true_distro_by_round, participant,
+                                             alters, divergence_type, round_offset)
+            assert game_diffs == pytest.approx(expected, rel=1e-9, abs=1e-12)
+
+
+def test_legacy_offset_changes_the_results(session, topology):
+
+    participant_data, true_distro_by_round = session
+    fixed, legacy = [ic.compare_alters(participant_data, true_distro_by_round, topology, 2,
+                                       strategies=("weakest_ties",), memory_length=MEMORY_LENGTH,
+                                       seed=3, legacy=legacy)["weakest_ties"]
+                     for legacy in (False, True)]
+
+    # same alters, different rounds of their names
+    assert all(fixed[participant][1] == legacy[participant][1] for participant in fixed)
+    assert any(fixed[participant][0] != legacy[participant][0] for participant in fixed)
+
+
+class FixedNet():
+
+    def __init__(self, edges):
+
+        self.network = nx.Graph()
+        self.network.add_edges_from(edges)
+
+
+@pytest.mark.parametrize("legacy, expected", [(False, [3, 4]), (True, [3, 2])])
+def test_spare_alter_borrowing_leaves_out_the_round_partner(legacy, expected):
+
+    # participant 1 only has alters 2 and 3, and always plays 2, so for two names
+    # it has to borrow from 3's alters: 1 (itself), 2 (the partner) and 4
+    participant_data = {1: {"actual_alters": {game_round: 2 for game_round in range(1,26)}}}
+    context = ic.ComparisonContext(participant_data, None, 2, legacy=legacy)
+    context._net = FixedNet([(1, 2), (1, 3), (3, 2), (3, 4)])
+
+    [(visible, alters)] = ic.spare_alter_strategy(context, 1)
+    assert visible == [expected]*25
+    assert alters == expected
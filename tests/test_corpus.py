@@ -0,0 +1,107 @@
+import os, csv
+
+import corpus
+import data_reader
+
+
+def test_MLM_export_rows_are_as_wide_as_the_header(tmp_path):
+
+    # every run with additional names, including the three name LATTICEC run
+    sessions = corpus.Corpus(data_directory=".").select(additional_names_count=(1,2,3), load=False)
+    assert max(session.additional_names_count for session in sessions) == 3
+
+    output_file = str(tmp_path / "MLM.csv")
+    row_count = corpus.export_MLM(output_file, sessions, processes=2)
+
+    with open(output_file, newline="") as f:
+        rows = list(csv.reader(f))
+    header, rows = rows[0], rows[1:]
+
+    assert len(rows) == row_count
+    widths = {len(row) for row in rows}
+    assert widths == {len(header)}
+    assert "coordinate.1.player.random_name_3" in header
+
+    # the runs with fewer names are padded on the right
+    third = header.index("coordinate.1.player.random_name_3")
+    for row in rows:
+        if row[0].startswith("1addtl"):
+            assert row[third - 2] != "" and row[third - 1] == "" and row[third] == ""
+
+
+def test_MLM_single_run_export_keeps_two_columns_when_they_fit():
+
+    keepers = data_reader.schema_fields("MLM")
+    assert data_reader.MLM_names_per_field([1]) == 2
+    assert data_reader.MLM_names_per_field([1, 3, 2]) == 3
+
+    column_names = data_reader.MLM_column_names(keepers, 2)
+    for row in data_reader.MLM_rows("Data-1addtl-RANDOMA.csv", keepers, 2):
+        assert len(row) == len(column_names)
+
+
+def data_directory(tmp_path, run_names):
+
+    directory = tmp_path / "data"
+    directory.mkdir(exist_ok=True)
+    for run_name in run_names:
+        file_name = "Data-{}.csv".format(run_name)
+        (directory / file_name).write_bytes(open(file_name, "rb").read())
+    return str(directory)
+
+
+def stored_runs(store_file):
+
+    with corpus.CorpusStore(store_file) as store:
+        return {session.run_name: session.names_played.tolist() for session in store}
+
+
+def test_interrupted_append_leaves_the_store_whole(tmp_path, monkeypatch):
+
+    directory = data_directory(tmp_path, ["1addtl-RANDOMA", "2addtl-SMALLA"])
+    store_file = str(tmp_path / "corpus.store")
+    corpus.ingest(directory, store_file, incremental=False, processes=1)
+    before = stored_runs(store_file)
+
+    data_directory(tmp_path, ["2addtl-RANDOMB"])
+
+    def interrupted(*arguments):
+        raise KeyboardInterrupt()
+    monkeypatch.setattr(corpus, "_store_packed_sessions", interrupted)
+    try:
+        corpus.ingest(directory, store_file, incremental=True, processes=1)
+    except KeyboardInterrupt:
+        pass
+    assert stored_runs(store_file) == before
+
+    monkeypatch.undo()
+    assert [session.run_name for session in corpus.ingest(directory, store_file, processes=1)] == ["2addtl-RANDOMB"]
+    after = stored_runs(store_file)
+    assert set(after) == set(before) | {"2addtl-RANDOMB"}
+    assert all(after[run_name] == names for run_name, names in before.items())
+
+
+def test_ingest_only_hashes_touched_files(tmp_path, monkeypatch):
+
+    directory = data_directory(tmp_path, ["1addtl-RANDOMA", "2addtl-SMALLA"])
+    store_file = str(tmp_path / "corpus.store")
+    corpus.ingest(directory, store_file, incremental=False, processes=1)
+
+    hashed = []
+    def counting_digest(file_name):
+        hashed.append(os.path.basename(file_name))
+        return data_reader.file_digest(file_name)
+    monkeypatch.setattr(corpus, "file_digest", counting_digest)
+
+    assert corpus.ingest(directory, store_file, processes=1) == []
+    assert hashed == []
+
+    # a new modification time means hashing again, but the same content isn't ingested
+    touched = os.path.join(directory, "Data-2addtl-SMALLA.csv")
+    os.utime(touched, ns=(os.stat(touched).st_atime_ns, os.stat(touched).st_mtime_ns + 10**9))
+    assert corpus.ingest(directory, store_file, processes=1) == []
+    assert hashed == ["Data-2addtl-SMALLA.csv"]
+
+    # and the manifest now has the new time
+    assert corpus.ingest(directory, store_file, processes=1) == []
+    assert hashed == ["Data-2addtl-SMALLA.csv"]
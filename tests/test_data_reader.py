@@ -0,0 +1,86 @@
+import pytest
+
+import data_reader
+
+
+def test_column_plan_keeps_every_keeper_in_order():
+
+    header = ["a", "b", "c", "b"]
+    # duplicated columns map to their first position, like header.index()
+    assert data_reader.column_plan(header, ["c", "b", "a"]) == [("c", 2), ("b", 1), ("a", 0)]
+
+
+def test_column_plan_names_the_missing_keeper():
+
+    with pytest.raises(KeyError, match="renamed.column"):
+        data_reader.column_plan(["a", "b"], ["a", "renamed.column", "b"])
+
+
+def participant_values():
+
+    values = {}
+    for i in range(1,26):
+        values["coordinate.{}.player.display_name".format(i)] = " Name{} ".format(i)
+        values["coordinate.{}.player.alter".format(i)] = "Alter{}".format(i)
+        values["coordinate.{}.group.id_in_subsession".format(i)] = str(i % 12 + 1)
+        values["coordinate.{}.player.stigmergy".format(i)] = "A, B" if i > 1 else ""
+        values["coordinate.{}.player.success".format(i)] = "1" if i % 2 else "0"
+    return values
+
+
+def test_participant_is_built_by_field_name():
+
+    values = participant_values()
+    # the order the fields come in doesn't matter
+    shuffled = dict(reversed(list(values.items())))
+    record = data_reader.participant_from_values(7, shuffled)
+
+    assert record == data_reader.participant_from_values(7, values)
+    assert record.names_played[0] == "name1"
+    assert record.alters_played[24] == "alter25"
+    assert record.group_numbers[:2] == (2, 3)
+    assert record.unstructured[:2] == ((), ("a", "b"))
+    assert record.successes[:2] == (True, False)
+
+
+def test_participant_missing_field_is_an_error():
+
+    values = participant_values()
+    del values["coordinate.3.player.alter"]
+    with pytest.raises(KeyError):
+        data_reader.participant_from_values(7, values)
+
+    # the success flags are optional
+    values = participant_values()
+    del values["coordinate.3.player.success"]
+    assert data_reader.participant_from_values(7, values).successes[2] is None
+
+
+def test_records_match_the_dictionary_import():
+
+    file_name = "Data-2addtl-RANDOMA.csv"
+    records = data_reader.import_participants(file_name, use_cache=False)
+    dictionaries = data_reader.import_file(file_name, use_cache=False)
+
+    assert records.keys() == dictionaries.keys()
+    for participant, values in dictionaries.items():
+        assert data_reader.participant_record(participant, values) == records[participant]
+
+
+@pytest.mark.parametrize("records_first", [True, False])
+def test_readers_with_the_same_keepers_keep_their_own_cache(tmp_path, records_first):
+
+    file_name = "Data-2addtl-RANDOMA.csv"
+    cache_directory = str(tmp_path)
+    read_records = lambda: data_reader.import_participants(file_name, cache_directory=cache_directory)
+    read_dicts = lambda: data_reader.import_file(file_name, schema="participant",
+                                                 cache_directory=cache_directory)
+
+    # the first pass fills the cache, the second reads both kinds back from it
+    for _ in range(2):
+        if records_first:
+            records, dicts = read_records(), read_dicts()
+        else:
+            dicts, records = read_dicts(), read_records()
+        assert all(isinstance(record, data_reader.Participant) for record in records.values())
+        assert all(isinstance(values, dict) for values in dicts.values())
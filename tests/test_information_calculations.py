@@ -0,0 +1,147 @@
+import os
+
+import numpy as np
+import pytest
+
+import data_reader
+import information_calculations as ic
+
+
+@pytest.fixture(scope="module")
+def session():
+
+    game_data = data_reader.import_participants("Data-2addtl-SMALLB.csv")
+    participant_data, group_round_names = data_reader.preanalysis_packing(game_data)
+    return data_reader.pack_session(game_data), participant_data, group_round_names
+
+
+def dictionary_divergences(participant_data, group_round_names, participant_ids,
+                           memory_length, divergence_type, with_unstructured):
+    """ (rounds x participants) divergences the dictionary way, with the swapped flags."""
+
+    distro_name = "distro_by_round_unstructured" if with_unstructured else "distro_by_round_no_unstructured"
+    true_distro_by_round = ic.impose_limited_memory(group_round_names, memory_length)
+
+    divergences = np.zeros((25, len(participant_ids)))
+    swapped = np.zeros((25, len(participant_ids)), dtype=bool)
+    for column, participant in enumerate(participant_ids):
+        distro_by_round = ic.impose_limited_memory(participant_data[int(participant)][distro_name],
+                                                   memory_length=memory_length)
+        for game_round in range(1,26):
+            seen, true = distro_by_round[game_round], true_distro_by_round[game_round]
+            swapped[game_round-1, column] = len(seen) > len(true)
+            divergences[game_round-1, column] = getattr(ic, divergence_type)(
+                *ic.create_continuity_and_probabilities(seen, true))
+    return divergences, swapped
+
+
+@pytest.mark.parametrize("divergence_type", ["KL", "JS"])
+@pytest.mark.parametrize("with_unstructured", [False, True])
+def test_memory_sweep_matches_the_dictionaries(session, divergence_type, with_unstructured):
+
+    packed, participant_data, group_round_names = session
+    memory_lengths = [1, 3, 8, 25]
+    sweep = ic.memory_sweep(packed, memory_lengths, divergence_type=divergence_type,
+                            with_unstructured=with_unstructured)
+
+    swapped_rounds = 0
+    for row, memory_length in enumerate(memory_lengths):
+        expected, swapped = dictionary_divergences(participant_data, group_round_names,
+                                                   packed.participant_ids, memory_length,
+                                                   divergence_type, with_unstructured)
+        np.testing.assert_allclose(sweep[row], expected, rtol=1e-10, atol=1e-12)
+        swapped_rounds += swapped.sum()
+
+    # with the unstructured names the comparison covers rounds where the seen
+    # names have more types than the true ones, where the legacy orientation is swapped
+    if with_unstructured:
+        assert swapped_rounds > 0
+
+
+def test_expected_divergence_matches_every_draw():
+
+    import itertools
+    seen = np.array([3, 0, 1, 2])
+    true = np.array([2, 2, 1, 0])
+    tokens = np.repeat(np.arange(len(true)), true)
+
+    # every subset of the true tokens is equally likely without replacement
+    draws = [np.bincount(tokens[list(subset)], minlength=len(true))
+             for subset in itertools.combinations(range(len(tokens)), 3)]
+    simulated = seen + np.array(draws)
+    brute = ic.aligned_divergences(simulated, np.broadcast_to(true, simulated.shape),
+                                   divergence_type="KL").mean()
+
+    assert ic.expected_divergence(seen, true, 3) == pytest.approx(brute, rel=1e-10)
+
+
+def test_expected_divergence_bound_is_part_of_the_memo():
+
+    seen = np.array([1, 1, 1, 1, 0])
+    true = np.array([3, 3, 3, 3, 3])
+    memo = {}
+
+    # too many ways under the small bound, but not under the large one
+    assert ic.expected_divergence(seen, true, 4, max_compositions=5, memo=memo) is None
+    assert ic.expected_divergence(seen, true, 4, max_compositions=1000, memo=memo) is not None
+
+
+def test_adaptive_averages_stop_at_max_iterations():
+
+    seen = np.array([[5, 0, 1, 0], [0, 4, 0, 2], [1, 1, 1, 1]])
+    true = np.array([3, 3, 3, 3])
+
+    # an unreachable target, and a block size that doesn't divide the cap
+    averages, counts = ic.adaptive_averages(seen, true, 4, target_sem=0, block_size=30,
+                                            max_iterations=100, rng=np.random.default_rng(0))
+    assert (counts == 100).all()
+    assert np.isfinite(averages).all()
+
+
+def relabeled_sessions(file_name):
+
+    import corpus
+    participant_data, group_round_names = corpus.load_session(file_name)
+    sessions = []
+    for convention_emerged in (True, False):
+        session = corpus.Session(file_name, convention_emerged)
+        session.participant_data, session.group_round_names = participant_data, group_round_names
+        sessions.append(session)
+    return sessions
+
+
+def test_gain_streams_do_not_depend_on_the_labels():
+
+    emerged, not_emerged = relabeled_sessions("Data-2addtl-SMALLB.csv")
+    assert emerged.key != not_emerged.key and emerged.run_key == not_emerged.run_key
+
+    surfaces = [ic.gain_surfaces([session], number_iterations=3, seed=7, cache=False, processes=1)[session.run_key]
+                for session in (emerged, not_emerged)]
+    np.testing.assert_array_equal(surfaces[0], surfaces[1])
+
+
+def test_relabeled_runs_find_their_cached_surface(tmp_path):
+
+    emerged, not_emerged = relabeled_sessions("Data-2addtl-SMALLB.csv")
+    cache = ic.SurfaceCache(str(tmp_path))
+
+    first = ic.gain_surfaces([emerged], number_iterations=3, seed=7, cache=cache, processes=1)
+    assert len(os.listdir(str(tmp_path))) == 1
+    second = ic.gain_surfaces([not_emerged], number_iterations=3, seed=7, cache=cache, processes=1)
+    assert len(os.listdir(str(tmp_path))) == 1
+    np.testing.assert_array_equal(first[emerged.run_key], second[not_emerged.run_key])
+
+
+def test_drawing_more_names_than_the_true_distribution_holds():
+
+    seen = np.array([1, 0, 0])
+    true = np.array([5, 3, 1])
+
+    # all nine names is the one composition left, and one more is an error on both paths
+    assert ic.expected_divergence(seen, true, 9) is not None
+    with pytest.raises(ValueError, match="Can't draw 10 additional names"):
+        ic.expected_divergence(seen, true, 10)
+    with pytest.raises(ValueError, match="Can't draw 10 additional names"):
+        ic.sample_additional_names(true, 10, 5)
+    with pytest.raises(ValueError, match="Can't draw 10 additional names"):
+        ic.simulate_gains(seen[None], true, exact=True)